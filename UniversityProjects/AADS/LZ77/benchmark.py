@@ -0,0 +1,312 @@
+"""
+Benchmark for myzip and myunzip. Generates a corpus of files (or uses given ones), compresses and decompresses each of
+them for every window and lookahead size (and level) asked for, checks the round trip and reports throughput,
+compression ratio and peak memory.
+
+Every compression and decompression runs in its own process so its peak memory (maximum resident set size) is not
+mixed up with the other runs or with the benchmark itself.
+
+Usage: python benchmark.py [--sizes 64K,1M] [--profiles text,random] [--wl 1024:16,4096:64] [--levels 1,6,9]
+"""
+
+__author__ = "Arthur Lee"
+
+import os
+import sys
+import csv
+import json
+import runpy
+import random
+import shutil
+import resource
+import argparse
+import tempfile
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+ALPHABET = "abcdefghijklmnopqrstuvwxyz"
+
+
+def parse_size(size):
+    """
+    Parses a size such as 64K or 100M
+
+    :param size: Size as a string
+    :return: Size in bytes
+    """
+    size = size.strip().upper().rstrip("B")
+    if size and size[-1] in UNITS:
+        return int(float(size[:-1]) * UNITS[size[-1]])
+    return int(size)
+
+
+def random_text(size, rng):
+    """
+    Generates printable chars with no structure (hardly compressible)
+
+    :param size: Number of chars
+    :param rng: Random number generator
+    :return: Text
+    """
+    chars = [chr(c) for c in range(32, 127)]
+    return "".join(rng.choices(chars, k=size))
+
+
+def zipf_text(size, rng):
+    """
+    Generates words from a vocabulary of 5000 made up words chosen with Zipf frequencies, like natural language text
+
+    :param size: Number of chars
+    :param rng: Random number generator
+    :return: Text
+    """
+    vocabulary = ["".join(rng.choices(ALPHABET, k=rng.randint(1, 10))) for _ in range(5000)]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+
+    # Generate a batch of words at a time until the size is reached
+    parts = []
+    length = 0
+    while length < size:
+        words = rng.choices(vocabulary, weights=weights, k=4096)
+        line = ". ".join(" ".join(words[i:i + 12]) for i in range(0, len(words), 12)) + ".\n"
+        parts.append(line)
+        length += len(line)
+    return "".join(parts)[:size]
+
+
+def repetitive_text(size, rng):
+    """
+    Generates a few long blocks repeated with small edits, like versions of a source file
+
+    :param size: Number of chars
+    :param rng: Random number generator
+    :return: Text
+    """
+    blocks = [zipf_text(2048, rng) for _ in range(8)]
+    parts = []
+    length = 0
+    while length < size:
+        block = list(rng.choice(blocks))
+        for _ in range(4):
+            block[rng.randrange(len(block))] = rng.choice(ALPHABET)
+        parts.append("".join(block))
+        length += len(block)
+    return "".join(parts)[:size]
+
+
+def run_text(size, rng):
+    """
+    Generates runs of a repeated char of random lengths (the most compressible case)
+
+    :param size: Number of chars
+    :param rng: Random number generator
+    :return: Text
+    """
+    parts = []
+    length = 0
+    while length < size:
+        run = rng.randint(1, 1000)
+        parts.append(rng.choice(ALPHABET) * run)
+        length += run
+    return "".join(parts)[:size]
+
+
+PROFILES = {"random": random_text, "text": zipf_text, "repetitive": repetitive_text, "runs": run_text}
+
+
+def generate(directory, profile, size, seed=0):
+    """
+    Writes a generated file to the directory, one chunk at a time so large files do not need to fit in memory
+
+    :param directory: Directory to write to
+    :param profile: Name of generator in PROFILES
+    :param size: Size of file in bytes
+    :param seed: Random seed
+    :return: Path of file
+    """
+    path = os.path.join(directory, "{}_{}.txt".format(profile, size))
+    rng = random.Random(seed)
+    with open(path, "w", newline="") as file:
+        written = 0
+        while written < size:
+            chunk = PROFILES[profile](min(1 << 22, size - written), rng)
+            file.write(chunk)
+            written += len(chunk)
+    return path
+
+
+def run(args):
+    """
+    Runs myzip or myunzip in this process and prints the time taken and peak memory as JSON (the --run mode). Peak
+    memory is the largest of this process and any worker processes it waited for.
+
+    :param args: Arguments for the script after its name
+    """
+    import lzstats
+    script, arguments = args[0], args[1:]
+    sys.argv = [script + ".py"] + arguments
+    started = lzstats.clock()
+    runpy.run_path(os.path.join(HERE, script + ".py"), run_name="__main__")
+    elapsed = lzstats.clock() - started
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    if sys.platform == "darwin":  # Reported in bytes rather than kilobytes
+        peak //= 1024
+    print(json.dumps({"time": elapsed, "peak": peak * 1024}))
+
+
+def measure(script, arguments, directory):
+    """
+    Runs myzip or myunzip in a new process
+
+    :param script: myzip or myunzip
+    :param arguments: Arguments for the script
+    :param directory: Working directory
+    :return: Dictionary of time taken in seconds and peak memory in bytes
+    """
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--run", script] + arguments, cwd=directory,
+                            stdout=subprocess.PIPE, check=True, universal_newlines=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def same_file(a, b, chunk_size=1 << 20):
+    """
+    Compares two files a chunk at a time
+
+    :param a: Path of 1st file
+    :param b: Path of 2nd file
+    :return: Whether the files have the same contents
+    """
+    if os.path.getsize(a) != os.path.getsize(b):
+        return False
+    with open(a, "rb") as file_a, open(b, "rb") as file_b:
+        while True:
+            chunk = file_a.read(chunk_size)
+            if chunk != file_b.read(chunk_size):
+                return False
+            if not chunk:
+                return True
+
+
+def benchmark(path, window, lookahead, level, options, directory):
+    """
+    Compresses and decompresses a file once and checks the round trip
+
+    :param path: Path of file
+    :param window: Window size (None to use the level's)
+    :param lookahead: Lookahead buffer size (None to use the level's)
+    :param level: Compression level (None for the original encoder)
+    :param options: Extra arguments for myzip (e.g. --stream)
+    :param directory: Working directory for the compressed and decompressed files
+    :return: Dictionary of results
+    """
+    # Important Variables
+    name = os.path.basename(path)
+    size = os.path.getsize(path)
+    work = os.path.join(directory, "work")
+    os.makedirs(work, exist_ok=True)
+    shutil.copyfile(path, os.path.join(work, name))
+
+    # Compress
+    arguments = [name] + ([str(window), str(lookahead)] if window is not None else []) + list(options)
+    if level is not None:
+        arguments += ["--level", str(level)]
+    compress = measure("myzip", arguments, work)
+    compressed = os.path.getsize(os.path.join(work, name + ".bin"))
+
+    # Decompress (myunzip writes the original name back into the working directory)
+    os.remove(os.path.join(work, name))
+    decompress = measure("myunzip", [name + ".bin"] + (["--stream"] if "--stream" in options else []), work)
+    ok = same_file(path, os.path.join(work, name))
+    shutil.rmtree(work)
+
+    # Done
+    megabytes = size / (1 << 20)
+    return {"file": name, "size": size, "window": window, "lookahead": lookahead, "level": level,
+            "ratio": size / max(compressed, 1), "compress_mbps": megabytes / max(compress["time"], 1e-9),
+            "decompress_mbps": megabytes / max(decompress["time"], 1e-9),
+            "compress_peak_mb": compress["peak"] / (1 << 20), "decompress_peak_mb": decompress["peak"] / (1 << 20),
+            "ok": ok}
+
+
+def main(files, settings, options, output=None):
+    """
+    Benchmarks every file with every setting and prints a table of results
+
+    :param files: Paths of files
+    :param settings: List of (window, lookahead, level)
+    :param options: Extra arguments for myzip
+    :param output: Path of CSV file to write results to (None for no CSV)
+    :return: List of results
+    """
+    columns = ["file", "size", "window", "lookahead", "level", "ratio", "compress_mbps", "decompress_mbps",
+               "compress_peak_mb", "decompress_peak_mb", "ok"]
+    row = "{:<24}{:>11}{:>8}{:>6}{:>6}{:>8}{:>10}{:>10}{:>9}{:>9}{:>5}"
+    print(row.format("file", "size", "W", "L", "lvl", "ratio", "zip MB/s", "unz MB/s", "zip MB", "unz MB", "ok"))
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for path in files:
+            for window, lookahead, level in settings:
+                result = benchmark(path, window, lookahead, level, options, directory)
+                results.append(result)
+                print(row.format(result["file"][:23], result["size"], str(window or "-"), str(lookahead or "-"),
+                                 str(level or "-"), "{:.3f}".format(result["ratio"]),
+                                 "{:.2f}".format(result["compress_mbps"]), "{:.2f}".format(result["decompress_mbps"]),
+                                 "{:.1f}".format(result["compress_peak_mb"]),
+                                 "{:.1f}".format(result["decompress_peak_mb"]), "yes" if result["ok"] else "NO"),
+                      flush=True)
+
+    # Write CSV
+    if output is not None:
+        with open(output, "w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(results)
+
+    # Done
+    return results
+
+
+if __name__ == "__main__":
+    # Run a single compression or decompression
+    if len(sys.argv) > 1 and sys.argv[1] == "--run":
+        run(sys.argv[2:])
+        sys.exit()
+
+    # Parse Arguments
+    parser = argparse.ArgumentParser(description="Benchmark myzip and myunzip")
+    parser.add_argument("--files", nargs="+", help="Files to benchmark instead of a generated corpus")
+    parser.add_argument("--sizes", default="64K,1M", help="Sizes of generated files, e.g. 64K,1M,100M")
+    parser.add_argument("--profiles", default="text,repetitive", help="Kinds of generated files: " +
+                        ",".join(PROFILES))
+    parser.add_argument("--wl", default="1024:16,4096:64", help="Window and lookahead sizes, e.g. 1024:16,32768:128")
+    parser.add_argument("--levels", help="Compression levels to benchmark (each with its own window and lookahead)")
+    parser.add_argument("--stream", action="store_true", help="Compress and decompress with --stream")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for generated files")
+    parser.add_argument("--csv", help="Write the results to this CSV file")
+    args = parser.parse_args()
+
+    # Settings to benchmark
+    settings = []
+    for pair in args.wl.split(",") if args.wl else []:
+        window, lookahead = pair.split(":")
+        settings.append((int(window), int(lookahead), None))
+    for level in args.levels.split(",") if args.levels else []:
+        settings.append((None, None, int(level)))
+
+    # Benchmark the files, generating them first if none were given
+    options = ["--stream"] if args.stream else []
+    if args.files:
+        results = main(args.files, settings, options, args.csv)
+    else:
+        with tempfile.TemporaryDirectory() as corpus:
+            files = [generate(corpus, profile, parse_size(size), args.seed)
+                     for profile in args.profiles.split(",") for size in args.sizes.split(",")]
+            results = main(files, settings, options, args.csv)
+
+    # Fail if any round trip did not give back the original file
+    sys.exit(0 if all(result["ok"] for result in results) else 1)
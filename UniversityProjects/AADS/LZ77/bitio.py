@@ -0,0 +1,360 @@
+"""
+Bit level I/O shared by myzip and myunzip. BitWriter packs codes into a word sized integer and moves whole bytes into a
+preallocated bytearray (or file), BitReader loads several bytes at a time from a memoryview (or file) so codes of many
+bits are read in one step.
+"""
+
+__author__ = "Arthur Lee"
+
+
+class BitArray:
+    """
+    Wrapper Class to deal with binary operations
+    """
+    def __init__(self, bits, length=None):
+        """
+        We store bits as an integer but mark the area we are interested in with a length.
+
+        :param bits: Bits stored as integer
+        :param length: Length of bit array (from LSB)
+        """
+        self.length = length if length is not None else self.bit_length(bits)
+        self.bits = bits & ((1 << self.length) - 1)
+
+    @staticmethod
+    def bit_length(n):
+        """
+        Compute the bit length of an int.
+
+        :param n: Integer
+        :return: Number of bits in minimal binary code of n
+        """
+        d = 0
+        while n > 0:
+            d += 1
+            n >>= 1
+        return d
+
+    def __len__(self):
+        """
+        Get the length of the BitArray
+
+        :return: Length of BitArray
+        """
+        return self.length
+
+    def __int__(self):
+        """
+        Convert the BitArray to int by returning the bits
+
+        :return: BitArray as int
+        """
+        return self.bits
+
+    def __str__(self):
+        """
+        Get the BitArray as a binary string for display purposes
+
+        :return: Bit string of BitArray
+        """
+        string = ""
+        for i in range(len(self)):
+            string += str(self[i])
+        return string
+
+    def ascii(self):
+        """
+        Get the ASCII representation of the BitArray if possible
+
+        :return:
+        """
+        if self.length == 8:  # If the length is 8, we can obtain the ASCII char represented by the int
+            return chr(int(self))
+        else:
+            raise ValueError("Bit length must be 8")
+
+    def __getitem__(self, item):
+        """
+        Get a bit at a certain index by shifting and masking
+
+        :param item: Index
+        :return: Bit at index
+        """
+        return (self.bits >> (self.length - item - 1)) & 1
+
+    def __setitem__(self, key, value):
+        """
+        Set a bit at a certain index by shifting and masking
+
+        :param key: Index
+        :param value: Bit to set
+        """
+        if value:   # Bit = 1
+            value <<= (self.length - key - 1)
+            self.bits |= value
+        else:   # Bit = 0
+            value = True
+            value <<= (self.length - key - 1)
+            self.bits &= ~value
+
+    def get_slice(self, start, end):
+        """
+        Get a slice of the bit from start to end (inclusive) using shifting and masking
+
+        :param start: Start of slice
+        :param end: End of slice
+        :return: Slice as a BitArray
+        """
+        new_bits = self.bits >> (self.length - end - 1)
+        new_bits &= (1 << (end - start + 1)) - 1
+        new_length = end - start + 1
+        return BitArray(new_bits, new_length)
+
+    def prepend(self, other):
+        """
+        Prepend another BitArray to the front
+
+        :param other: Another BitArray
+        """
+        other.bits <<= self.length
+        self.bits |= other.bits
+        self.length += other.length
+
+    def append(self, other):
+        """
+        Append another BitArray to the back
+
+        :param other: Another BitArray
+        """
+        self.bits <<= other.length
+        self.bits |= other.bits
+        self.length += other.length
+
+    def extend(self, n):
+        """
+        Pads n 0s to the back of BitArray
+
+        :param n: Length of extension
+        """
+        self.bits <<= n
+        self.length += n
+
+    def contract(self, n):
+        """
+        Shortens the BitArray without changing anything
+
+        :param n: Length of contraction
+        """
+        self.length -= n
+        self.bits &= ((1 << self.length) - 1)
+
+    def to_bytes(self):
+        """
+        Converts 1st 8 bits in BitArray to bytearray representation
+
+        :return: BitArray as bytearray
+        """
+        byte_array = int(self.get_slice(0, 7))
+        self.contract(8)
+        return byte_array
+
+
+class BitWriter:
+    """
+    Writes bits MSB first. Bits are accumulated in an integer word and moved into the buffer a whole number of bytes at
+    a time once the word holds at least 64 bits.
+    """
+    def __init__(self, output=None, capacity=1 << 16):
+        """
+        Constructor
+
+        :param output: Binary file to write full buffers to (None to keep all bytes in the buffer)
+        :param capacity: Initial size of buffer in bytes
+        """
+        self.output = output
+        self.buffer = bytearray(capacity)
+        self.offset = 0     # Bytes already written to the output
+        self.size = 0       # Bytes used in buffer
+        self.word = 0       # Bits not yet moved to buffer
+        self.bits = 0       # Number of bits in word
+
+    def __len__(self):
+        """
+        Get the number of bits written so far
+
+        :return: Number of bits
+        """
+        return ((self.offset + self.size) << 3) + self.bits
+
+    def write(self, value, length):
+        """
+        Writes the length least significant bits of value
+
+        :param value: Bits as int (must fit in length bits)
+        :param length: Number of bits
+        """
+        self.word = (self.word << length) | value
+        self.bits += length
+        if self.bits >= 64:
+            self.flush_word()
+
+    def write_bytes(self, data):
+        """
+        Pads to a whole byte and writes bytes as they are
+
+        :param data: Bytes to write
+        """
+        self.align()
+        self.flush_word()
+        self.reserve(len(data))
+        self.buffer[self.size:self.size + len(data)] = data
+        self.size += len(data)
+
+    def align(self):
+        """
+        Pads 0s until a whole number of bytes has been written
+        """
+        if self.bits & 7:
+            self.write(0, 8 - (self.bits & 7))
+
+    def flush_word(self):
+        """
+        Moves the whole bytes in the word into the buffer
+        """
+        n = self.bits >> 3
+        self.reserve(n)
+        self.bits -= n << 3
+        self.buffer[self.size:self.size + n] = (self.word >> self.bits).to_bytes(n, "big")
+        self.size += n
+        self.word &= (1 << self.bits) - 1
+
+    def reserve(self, n):
+        """
+        Makes room for n more bytes in the buffer, writing it to the output or doubling it if full
+
+        :param n: Number of bytes
+        """
+        if self.size + n > len(self.buffer):
+            if self.output is not None:
+                self.output.write(memoryview(self.buffer)[:self.size])
+                self.offset += self.size
+                self.size = 0
+            if self.size + n > len(self.buffer):
+                self.buffer.extend(bytes(max(len(self.buffer), self.size + n - len(self.buffer))))
+
+    def getvalue(self):
+        """
+        Pads to a whole byte and gets everything written so far (when there is no output)
+
+        :return: Written bytes as bytearray
+        """
+        self.align()
+        self.flush_word()
+        return self.buffer[:self.size]
+
+    def flush(self):
+        """
+        Pads to a whole byte and writes the buffer to the output
+        """
+        self.align()
+        self.flush_word()
+        self.output.write(memoryview(self.buffer)[:self.size])
+        self.offset += self.size
+        self.size = 0
+
+
+class BitReader:
+    """
+    Reads bits MSB first from a bytes-like object or a binary file. Bytes are loaded into an integer word up to 8 at a
+    time, and reads past the end give 0s.
+    """
+    def __init__(self, source, chunk_size=1 << 20, prefix=b""):
+        """
+        Constructor
+
+        :param source: Bytes-like object, or binary file read a chunk at a time
+        :param chunk_size: Number of bytes read at a time from a file
+        :param prefix: Bytes already read from the file, read before the rest of the file
+        """
+        if hasattr(source, "read"):
+            self.file = source
+            self.data = memoryview(prefix)
+        else:
+            self.file = None
+            self.data = memoryview(source)
+        self.chunk_size = chunk_size
+        self.offset = 0     # Position of data[0] in source
+        self.index = 0      # Next byte of data to load into word
+        self.word = 0       # Loaded bits (only the last bits are unread)
+        self.bits = 0       # Number of unread bits in word
+
+    def refill(self, n):
+        """
+        Loads bytes into the word until it holds at least n unread bits or the source is exhausted
+
+        :param n: Number of bits
+        """
+        while self.bits < n:
+            # Load the next chunk of the file
+            if self.index >= len(self.data):
+                if self.file is None:
+                    return
+                self.offset += len(self.data)
+                self.data = memoryview(self.file.read(self.chunk_size))
+                self.index = 0
+                if len(self.data) == 0:
+                    return
+
+            # Load up to 8 bytes at once
+            chunk = self.data[self.index:self.index + 8]
+            self.word = ((self.word & ((1 << self.bits) - 1)) << (len(chunk) << 3)) | int.from_bytes(chunk, "big")
+            self.bits += len(chunk) << 3
+            self.index += len(chunk)
+
+    def peek(self, n):
+        """
+        Gets the next n bits without consuming them
+
+        :param n: Number of bits
+        :return: Bits as int
+        """
+        if self.bits < n:
+            self.refill(n)
+            if self.bits < n:
+                return (self.word << (n - self.bits)) & ((1 << n) - 1)
+        return (self.word >> (self.bits - n)) & ((1 << n) - 1)
+
+    def skip(self, n):
+        """
+        Consumes the next n bits
+
+        :param n: Number of bits
+        """
+        if self.bits < n:
+            self.refill(n)
+        self.bits = max(0, self.bits - n)
+
+    def read(self, n):
+        """
+        Reads the next n bits
+
+        :param n: Number of bits
+        :return: Bits as int
+        """
+        value = self.peek(n)
+        self.skip(n)
+        return value
+
+    def align(self):
+        """
+        Skips the rest of a partially read byte (the word only ever holds whole bytes)
+        """
+        self.skip(self.bits & 7)
+
+    def tell(self):
+        """
+        Get the position of the next byte to be read (after align)
+
+        :return: Byte position in source
+        """
+        return self.offset + self.index - (self.bits >> 3)
@@ -0,0 +1,57 @@
+"""
+Constants shared by myzip and myunzip describing the versions of the .bin format.
+
+Files written by the original encoder start directly with the Elias code of the file name length, which never starts
+with a 1 bit for a non-empty name. Every later version starts with MAGIC instead (whose first bit is 1) followed by a
+version byte, so both can be told apart from the first byte.
+"""
+
+__author__ = "Arthur Lee"
+
+MAGIC = b"\x89LZ7"
+
+# Versions
+STREAM = 1  # Window and lookahead sizes followed by the original format, for bounded memory decoding
+BLOCKS = 2  # Independently compressed blocks behind an index of their sizes, for parallel encoding and decoding
+INDEXED = 3  # Independently compressed blocks followed by an index of their offsets, for decoding only part of a file
+ARCHIVE = 4  # Many files sharing one Huffman encoding, followed by a directory of their names and offsets
+
+# Flags (set in the version byte on top of the version)
+CANONICAL = 0x80  # Huffman encodings store only the code lengths of canonical codes
+BYTES = 0x40  # File is arbitrary bytes (chars are the 256 byte values) rather than UTF-8 text
+FLAGS = CANONICAL | BYTES
+
+
+def header(version, flags=0):
+    """
+    Gets the bytes a file of the given version starts with
+
+    :param version: Format version
+    :param flags: Format flags
+    :return: Magic bytes and version byte
+    """
+    return MAGIC + bytes([version | flags])
+
+
+def version(encoded):
+    """
+    Gets the version of an encoded file from its first bytes
+
+    :param encoded: Encoded data (anything indexable byte by byte)
+    :return: Format version, 0 if the file is in the original format
+    """
+    if len(encoded) > len(MAGIC) and bytes(encoded[i] for i in range(len(MAGIC))) == MAGIC:
+        return encoded[len(MAGIC)] & ~FLAGS
+    return 0
+
+
+def flags(encoded):
+    """
+    Gets the flags of an encoded file from its first bytes
+
+    :param encoded: Encoded data (anything indexable byte by byte)
+    :return: Format flags, 0 if the file is in the original format
+    """
+    if len(encoded) > len(MAGIC) and bytes(encoded[i] for i in range(len(MAGIC))) == MAGIC:
+        return encoded[len(MAGIC)] & FLAGS
+    return 0
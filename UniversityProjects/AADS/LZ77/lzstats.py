@@ -0,0 +1,42 @@
+"""
+Time spent in each stage of myzip and myunzip, printed with --stats.
+
+Stages that run once per file or block are always timed. Stages that run once per triple are only timed when enabled
+is set, as timing them costs a little for every triple. Blocks compressed or decoded in worker processes are timed in
+those processes and are not included.
+"""
+
+__author__ = "Arthur Lee"
+
+import sys
+import time
+
+enabled = False     # Whether per triple stages are timed
+times = {}          # Seconds spent in every stage
+clock = time.perf_counter
+
+
+def add(stage, seconds):
+    """
+    Adds time spent in a stage
+
+    :param stage: Name of stage
+    :param seconds: Time spent
+    """
+    times[stage] = times.get(stage, 0) + seconds
+
+
+def report(total, file=sys.stderr):
+    """
+    Prints the time spent in every stage, in the order they were first timed
+
+    :param total: Total time taken, the rest is reported as other
+    :param file: Text file to print to
+    """
+    other = total
+    for stage, seconds in times.items():
+        print("{:<16}{:>9.3f}s {:>5.1f}%".format(stage, seconds, 100 * seconds / max(total, 1e-9)), file=file)
+        other -= seconds
+    print("{:<16}{:>9.3f}s {:>5.1f}%".format("other", max(other, 0), 100 * max(other, 0) / max(total, 1e-9)),
+          file=file)
+    print("{:<16}{:>9.3f}s".format("total", total), file=file)
@@ -4,442 +4,936 @@ Decodes a binary file into the original file using the LZ77 algorithm, Elias Ome
 
 __author__ = "Arthur Lee"
 
+import os
 import sys
+import asyncio
+import bisect
+import argparse
+import functools
+import multiprocessing
 
+import lzformat
+import lzstats
+from bitio import BitReader
 
-def read_input(filename):
+
+def read_input(filename, size=-1):
     """
     Reads the contents of the compressed binary file
 
     :param filename: Name of file
+    :param size: Number of bytes to read (Default to whole file)
     :return: File contents
     """
     file = open(filename, "rb")
-    contents = file.read()
+    contents = file.read(size)
     file.close()
     return contents
 
 
+def read_block(file, start, end):
+    """
+    Reads a byte range of an open binary file
+
+    :param file: Binary file
+    :param start: Start of range
+    :param end: End of range (exclusive)
+    :return: Bytes in range
+    """
+    file.seek(start)
+    return file.read(end - start)
+
+
 def write_output(filename, contents):
     """
     Writes the uncompressed file data to the file
 
     :param filename: Name of original file
-    :param contents: Original file data
+    :param contents: Original file data (str, or bytes for binary files)
     """
-    file = open(filename, "w", encoding="utf-8")
+    if isinstance(contents, str):
+        file = open(filename, "w", encoding="utf-8")
+    else:
+        file = open(filename, "wb")
     file.write(contents)
     file.close()
 
 
-class BitArray:
+def elias_table(bits):
     """
-    Wrapper Class to deal with binary operations
+    Builds the lookup table used in Elias Decoding. The next bits are peeked at once and looked up in a table of 2^bits
+    entries giving the decoded integer and its code length, for every code no longer than bits.
+
+    :param bits: Number of bits looked up
+    :return: Table as list of (n << 6) | code length, 0 where the code is longer than bits
     """
-    def __init__(self, bits, length=None):
-        """
-        We store bits as an integer but mark the area we are interested in with a length.
+    # Important Variables
+    table = [0] * (1 << bits)
+    n = 1
+
+    # Add codes of n = 1, 2, ... until they no longer fit
+    while True:
+        # Compute the code of n as in the encoder
+        code = n
+        length = n.bit_length()
+        k = n
+        while k > 1:
+            k = k.bit_length() - 1
+            code |= (k & ~(1 << (k.bit_length() - 1))) << length
+            length += k.bit_length()
+        if length > bits:
+            break
+
+        # Every index starting with the code maps to n
+        first = code << (bits - length)
+        for i in range(first, first + (1 << (bits - length))):
+            table[i] = (n << 6) | length
+        n += 1
 
-        :param bits: Bits stored as integer
-        :param length: Length of bit array (from LSB)
-        """
-        self.length = length if length is not None else self.bit_length(bits)
-        self.bits = bits & ((1 << self.length) - 1)
+    # Done
+    return table
 
-    @staticmethod
-    def bit_length(n):
-        """
-        Compute the bit length of an int.
 
-        :param n: Integer
-        :return: Number of bits in minimal binary code of n
-        """
-        d = 0
-        while n > 0:
-            d += 1
-            n >>= 1
-        return d
+ELIAS_BITS = 16
+ELIAS_TABLE = elias_table(ELIAS_BITS)
 
-    def __len__(self):
-        """
-        Get the length of the BitArray
 
-        :return: Length of BitArray
-        """
-        return self.length
+def elias_decode(reader, start=0):
+    """
+    Decodes the next Elias encoded integer
 
-    def __int__(self):
-        """
-        Convert the BitArray to int by returning the bits
+    :param reader: BitReader of encoded data
+    :param start: Start point of Elias Code (Default to 0)
+    :return: Decoded Value as int
+    """
+    # Short codes are a single lookup
+    entry = ELIAS_TABLE[reader.peek(ELIAS_BITS)]
+    if entry:
+        reader.skip(entry & 63)
+        return (entry >> 6) + start - 1
 
-        :return: BitArray as int
-        """
-        return self.bits
+    # Current Length
+    k = 1
 
-    def __str__(self):
-        """
-        Get the BitArray as a binary string for display purposes
+    # Loop until MSB == 1, reading each length group at once (its leading 0 stands for a 1)
+    while reader.peek(1) != 1:
+        k = (reader.read(k) | (1 << (k - 1))) + 1
 
-        :return: Bit string of BitArray
-        """
-        string = ""
-        for i in range(len(self)):
-            string += str(self[i])
-        return string
+    # Get Number
+    n = reader.read(k)
 
-    def ascii(self):
-        """
-        Get the ASCII representation of the BitArray if possible
+    # Done
+    return n + start - 1
 
-        :return:
-        """
-        if self.length == 8:  # If the length is 8, we can obtain the ASCII char represented by the int
-            return chr(int(self))
-        else:
-            raise ValueError("Bit length must be 8")
 
-    def __getitem__(self, item):
+class HuffmanTable:
+    """
+    Lookup table used in Huffman Decoding. The next bits are peeked at once and looked up in a table of 2^bits entries
+    giving the char and its code length, so a char is decoded in one step instead of one step per bit. Codes longer
+    than bits share an entry pointing to a secondary table for their remaining bits.
+    """
+    def __init__(self, code, bits=10):
         """
-        Get a bit at a certain index by shifting and masking
+        Constructor. Builds the tables from the given encoding.
 
-        :param item: Index
-        :return: Bit at index
+        :param code: List of (char, code as int, code length) triples
+        :param bits: Maximum number of bits looked up per table
         """
-        return (self.bits >> (self.length - item - 1)) & 1
+        self.table, self.bits = self.build(code, 0, bits)
 
-    def __setitem__(self, key, value):
+    @classmethod
+    def build(cls, codes, depth, bits):
         """
-        Set a bit at a certain index by shifting and masking
+        Builds the table for codes sharing their first depth bits
 
-        :param key: Index
-        :param value: Bit to set
-        """
-        if value:   # Bit = 1
-            value <<= (self.length - key - 1)
-            self.bits |= value
-        else:   # Bit = 0
-            value = True
-            value <<= (self.length - key - 1)
-            self.bits &= ~value
-
-    def get_slice(self, start, end):
+        :param codes: List of (char, code as int, code length) triples
+        :param depth: Number of bits already looked up by parent tables
+        :param bits: Maximum number of bits looked up per table
+        :return: Table as list of (char, code length, secondary table, secondary bits) and number of bits looked up
         """
-        Get a slice of the bit from start to end (inclusive) using shifting and masking
+        # Important Variables
+        max_bits = bits
+        bits = min(bits, max([length for _, _, length in codes], default=depth + 1) - depth)
+        table = [None] * (1 << bits)
+        longer = {}
 
-        :param start: Start of slice
-        :param end: End of slice
-        :return: Slice as a BitArray
-        """
-        new_bits = self.bits >> (self.length - end - 1)
-        new_bits &= (1 << (end - start + 1)) - 1
-        new_length = end - start + 1
-        return BitArray(new_bits, new_length)
+        # Every index starting with a short code maps to its char
+        for char, value, length in codes:
+            rest = length - depth
+            if rest <= bits:
+                first = (value & ((1 << rest) - 1)) << (bits - rest)
+                for i in range(first, first + (1 << (bits - rest))):
+                    table[i] = (char, length, None, 0)
 
-    def prepend(self, other):
-        """
-        Prepend another BitArray to the front
+            # Collect longer codes by their first bits in this table
+            else:
+                longer.setdefault((value >> (rest - bits)) & ((1 << bits) - 1), []).append((char, value, length))
 
-        :param other: Another BitArray
-        """
-        other.bits <<= self.length
-        self.bits |= other.bits
-        self.length += other.length
+        # Longer codes go through a secondary table
+        for i, sub_codes in longer.items():
+            sub_table, sub_bits = cls.build(sub_codes, depth + bits, max_bits)
+            table[i] = (None, depth + bits, sub_table, sub_bits)
 
-    def append(self, other):
-        """
-        Append another BitArray to the back
+        # Done
+        return table, bits
 
-        :param other: Another BitArray
-        """
-        self.bits <<= other.length
-        self.bits |= other.bits
-        self.length += other.length
 
-    def extend(self, n):
-        """
-        Pads n 0s to the back of BitArray
+def huffman_decode(reader, table):
+    """
+    Decodes the next huffman encoded char
 
-        :param n: Length of extension
-        """
-        self.bits <<= n
-        self.length += n
+    :param reader: BitReader of encoded data
+    :param table: Lookup Table of Huffman Key
+    :return: Original Char
+    """
+    # Look up the next bits until a char is found
+    char, length, sub_table, sub_bits = table.table[reader.peek(table.bits)]
+    while char is None:
+        depth = length
+        char, length, sub_table, sub_bits = sub_table[reader.peek(depth + sub_bits) & ((1 << sub_bits) - 1)]
 
-    def contract(self, n):
-        """
-        Shortens the BitArray without changing anything
+    # Consume the code
+    reader.skip(length)
 
-        :param n: Length of contraction
-        """
-        self.length -= n
-        self.bits &= ((1 << self.length) - 1)
+    # Done
+    return char
 
-    def to_bytes(self):
-        """
-        Converts 1st 8 bits in BitArray to bytearray representation
 
-        :return: BitArray as bytearray
-        """
-        byte_array = int(self.get_slice(0, 7))
-        self.contract(8)
-        return byte_array
+def lz77_decode(data, size, offset, length, char):
+    """
+    LZ77 Decoder that writes an LZ77 triple into a preallocated buffer. The referenced chars are copied as one slice,
+    or when they overlap the chars being written (offset < length) as slices doubling in size, since every copy
+    doubles the part of the repeating pattern already written.
+
+    :param data: bytearray of decoded chars (as their codes) with room for the triple
+    :param size: Number of chars decoded into data so far
+    :param offset: Offset
+    :param length: Length
+    :param char: Next Char (as its code)
+    :return: Number of chars decoded into data
+    """
+    # Important Values
+    start = size - offset
+
+    # Copy referenced chars
+    if length <= offset:
+        data[size:size + length] = data[start:start + length]
+
+    # Overlapping chars repeat with period offset, copy the pattern written so far until length is reached
+    else:
+        copied = 0
+        while copied < length:
+            count = min(offset + copied, length - copied)
+            data[size + copied:size + copied + count] = data[start:start + count]
+            copied += count
+
+    # Add next char
+    data[size + length] = char
+
+    # Done
+    return size + length + 1
 
 
-def elias_decode(container, encoded, current, start=0):
+def join_data(data, binary=False):
     """
-    Decodes the most significant Elias encoded integer in encoded
+    Converts decoded chars back into file data
 
-    :param container: Current byte in iteration
-    :param encoded: Encoded data
-    :param current: Current byte index
-    :param start: Start point of Elias Code (Default to 0)
-    :return: Decoded Value as int
+    :param data: bytearray of decoded chars (as their codes)
+    :param binary: Whether the file is bytes instead of text
+    :return: File data as str, or bytes if binary
     """
-    # Current Length
-    k = 1
+    if binary:
+        return bytes(data)
+    return data.decode("latin-1")
 
-    # Loop until MSB == 1
-    while container[0] != 1:
-        container[0] = 1
 
-        # Get Length
-        d = 0       # Current Length
-        p = k - 1   # Power
-        while p > -1:
-            d += container[0] << p
-            p -= 1
-            container.contract(1)
-            container, encoded, current = update_container(container, encoded, current)
+def decode_name(reader):
+    """
+    Decodes the file name as its length followed by its chars
 
-        k = d + 1
+    :param reader: BitReader of encoded data
+    :return: File Name
+    """
+    # Get File Name Length
+    name_length = elias_decode(reader)
 
-    # Get Number
-    n = 0      # Current Length
-    p = k - 1  # Power
-    while p > -1:
-        n += container[0] << p
-        p -= 1
-        container.contract(1)
-        container, encoded, current = update_container(container, encoded, current)
+    # Uncompress File Name
+    name = []
+    for _ in range(name_length):
+        name.append(chr(reader.read(8)))
 
-    # Done
-    return container, encoded, current, n + start - 1
+    # Join chars
+    return "".join(name)
 
 
-class Node:
+def decode_huffman(reader, canonical=False):
     """
-    Simple Node Class for a node in CharTree
+    Decodes the Huffman encoding as the number of unique chars followed by each char and its code. Chars are kept as
+    their codes, which is what the decoder writes into its buffer.
+
+    :param reader: BitReader of encoded data
+    :param canonical: Whether only canonical code lengths are stored
+    :return: Lookup Table of Huffman Key
     """
-    def __init__(self, char=None):
-        """
-        Constructor. Has link to the left child and right child. Stores char if leaf, else None.
+    # Canonical codes are rebuilt from their lengths
+    started = lzstats.clock()
+    if canonical:
+        huffman_table = decode_canonical(reader)
+        lzstats.add("huffman build", lzstats.clock() - started)
+        return huffman_table
 
-        :param char: Char to store
-        """
-        self.left = None
-        self.right = None
-        self.char = char
+    # Get Number of Distinct Chars
+    distinct_chars = elias_decode(reader)
+
+    # Get Huffman Encoding Key
+    huffman_key = []
+    for _ in range(distinct_chars):
+        # Get char and length of code
+        char_index = reader.read(8)
+        code_length = elias_decode(reader)
+
+        # Add char and code to key
+        huffman_key.append((char_index, reader.read(code_length), code_length))
 
+    # Compute the Lookup Table
+    huffman_table = HuffmanTable(huffman_key)
+    lzstats.add("huffman build", lzstats.clock() - started)
+    return huffman_table
 
-class CharTree:
+
+def decode_canonical(reader):
     """
-    A BST used in Huffman Decoding
+    Decodes a canonical Huffman encoding as the number of unique chars, the number of codes of every length up to the
+    longest one, and the chars in order of their codes. Codes are consecutive within a length and shifted left
+    whenever the length grows.
+
+    :param reader: BitReader of encoded data
+    :return: Lookup Table of Huffman Key
     """
-    def __init__(self, code):
-        """
-        Constructor. Initialises the tree from the given encoding.
-        """
-        self.root = Node()
-        for char, encoding in code:
-            self.insert(char, encoding)
+    # Get Number of Distinct Chars
+    distinct_chars = elias_decode(reader)
+    if distinct_chars == 0:
+        return HuffmanTable([])
+
+    # Get Number of Codes of each Length
+    max_length = elias_decode(reader)
+    counts = []
+    for _ in range(max_length):
+        counts.append(elias_decode(reader))
+
+    # Assign codes to chars in order
+    huffman_key = []
+    value = 0
+    for length, count in enumerate(counts, 1):
+        for _ in range(count):
+            huffman_key.append((reader.read(8), value, length))
+            value += 1
+        value <<= 1
 
-    def insert(self, char, code):
-        """
-        Insert an entry a Huffman Code into the tree
+    # Compute the Lookup Table
+    return HuffmanTable(huffman_key)
 
-        :param char: Char to store
-        :param code: Huffman code as bitarray
-        """
-        # Start from root and loop through code
-        current = self.root
-        for i in range(len(code)):
 
-            # Go left if 0
-            if code[i] == 0:
+def decode_header(reader, canonical=False):
+    """
+    Decodes the file name, file length, and Huffman encoding that precede the LZ77 encoded data
 
-                # Add Node if it does not exist
-                if current.left is None:
-                    current.left = Node(char=char if i == len(code) - 1 else None)
+    :param reader: BitReader of encoded data
+    :param canonical: Whether only canonical code lengths are stored
+    :return: File Name, File Data Length, and Lookup Table of Huffman Key
+    """
+    name = decode_name(reader)
+    data_length = elias_decode(reader)
+    huffman_table = decode_huffman(reader, canonical)
+    return name, data_length, huffman_table
 
-                # Go left
-                current = current.left
 
-            # Go right if 1
-            else:
+def decode_index(reader):
+    """
+    Decodes the header of the block container: the file name, file length, and the compressed size of every block
 
-                # Add Node if it does not exist
-                if current.right is None:
-                    current.right = Node(char=char if i == len(code) - 1 else None)
+    :param reader: BitReader of encoded data
+    :return: File Name, File Data Length, list of (start, end) byte ranges of the blocks in encoded
+    """
+    # Get File Name and File Data Length
+    name = decode_name(reader)
+    data_length = elias_decode(reader)
+
+    # Get Block Sizes
+    block_count = elias_decode(reader)
+    sizes = []
+    for _ in range(block_count):
+        sizes.append(elias_decode(reader))
+
+    # Blocks start at the byte after the header
+    reader.align()
+    start = reader.tell()
+    blocks = []
+    for size in sizes:
+        blocks.append((start, start + size))
+        start += size
 
-                # Go right
-                current = current.right
+    # Done
+    return name, data_length, blocks
 
 
-def huffman_decode(container, encoded, current, tree):
+def decode_offsets(reader, index):
     """
-    Decodes the most significant huffman encoded char in encoded
+    Decodes the block index at the end of an indexed file: the compressed and original size of every block. Blocks
+    are stored one after another right before the index.
 
-    :param container: Current byte in iteration
-    :param encoded: Encoded data
-    :param current: Current byte index
-    :param tree: Binary Tree of Huffman Key
-    :return: Original Char
+    :param reader: BitReader of the block index
+    :param index: Offset of the block index in the file
+    :return: List of (start, end) byte ranges of the blocks in the file, and list of the offsets of the blocks in the
+             original file (with the file length at the end)
     """
-    # Loop through tree
-    current_node = tree.root
-    while current_node.char is None:
+    # Get Block Sizes
+    block_count = elias_decode(reader)
+    sizes = []
+    offsets = [0]
+    for _ in range(block_count):
+        sizes.append(elias_decode(reader))
+        offsets.append(offsets[-1] + elias_decode(reader))
+
+    # Blocks end at the index
+    start = index - sum(sizes)
+    blocks = []
+    for size in sizes:
+        blocks.append((start, start + size))
+        start += size
 
-        # Go left if 0 found
-        if container[0] == 0:
-            current_node = current_node.left
+    # Done
+    return blocks, offsets
 
-        # Go right if 1 found
-        else:
-            current_node = current_node.right
 
-        # Update container and encoded
-        container.contract(1)
-        container, encoded, current = update_container(container, encoded, current)
+def read_offsets(file):
+    """
+    Reads the block index of an indexed file, whose offset is stored in the last 8 bytes
 
-    # Done
-    return container, encoded, current, current_node.char
+    :param file: Binary file
+    :return: Same as decode_offsets
+    """
+    file.seek(-8, os.SEEK_END)
+    end = file.tell()
+    index = int.from_bytes(file.read(8), "big")
+    return decode_offsets(BitReader(read_block(file, index, end)), index)
 
 
-def lz77_decode(data, offset, length, char):
+def decode_block(block, canonical=False, binary=False):
     """
-    LZ77 Decoder that updates the data given an LZ77 triple
+    Decodes a block of the block container
 
-    :param data: Current data
-    :param offset: Offset
-    :param length: Length
-    :param char: Next Char
-    :return: Updated data
+    :param block: Compressed Block
+    :param canonical: Whether only canonical code lengths are stored
+    :param binary: Whether the file is bytes instead of text
+    :return: Block Contents (bytes if binary)
     """
-    # Important Values
-    current = len(data)
-    count = 0
+    # Get Block Length and Huffman Encoding
+    reader = BitReader(block)
+    data_length = elias_decode(reader)
+    huffman_table = decode_huffman(reader, canonical)
 
-    # Loop append offset chars
-    i = current - offset
-    while count < length:
-        data.append(data[i])
-        count += 1
-        i += 1
-        if i >= current:
-            i = current - offset
+    # Uncompress Block Data using LZ77
+    return join_data(decode_data(reader, data_length, huffman_table), binary)
 
-    # Append next char
-    data.append(char)
 
-    # Done
-    return data
+def decode_blocks(blocks, workers=None, canonical=False, binary=False):
+    """
+    Decodes blocks of the block container in a pool of worker processes
+
+    :param blocks: Iterable of compressed blocks
+    :param workers: Number of worker processes (Default to number of CPUs)
+    :param canonical: Whether only canonical code lengths are stored
+    :param binary: Whether the file is bytes instead of text
+    :return: Iterator of block contents in order (the workers are stopped once it is exhausted or closed)
+    """
+    workers = workers or os.cpu_count() or 1
+    decode = functools.partial(decode_block, canonical=canonical, binary=binary)
+    if workers == 1:
+        yield from map(decode, blocks)
+    else:
+        pool = multiprocessing.Pool(workers)
+        try:
+            yield from pool.imap(decode, blocks)
+        finally:
+            pool.terminate()
+            pool.join()
+
+
+def iter_data(reader, data_length, huffman_table, window, flush_size=1 << 16):
+    """
+    Decodes the LZ77 encoded data into a preallocated buffer holding the window and flush_size more chars. Whenever
+    the buffer is full, the decoded chars that can no longer be referenced are yielded and the window is moved to the
+    front.
+
+    :param reader: BitReader of encoded data
+    :param data_length: Length of File Data
+    :param huffman_table: Lookup Table of Huffman Key
+    :param window: Window size used to encode
+    :param flush_size: Number of chars past the window to collect before yielding them
+    :return: Generator of decoded chunks as bytearrays of char codes
+    """
+    # Important Variables
+    data = bytearray(min(data_length, window + flush_size))
+    size = 0
+
+    # Stage Timing
+    timed = lzstats.enabled
+    read_time = copy_time = 0
+
+    # Uncompress File Data using LZ77
+    i = 0
+    while i < data_length:
+        if timed:
+            started = lzstats.clock()
+        offset = elias_decode(reader)
+        length = elias_decode(reader)
+        char = huffman_decode(reader, huffman_table)
+        if timed:
+            read = lzstats.clock()
+            read_time += read - started
+
+        # Buffer full: yield chars that can no longer be referenced and move the window to the front
+        if size + length >= len(data):
+            flushed = max(0, size - window)
+            if flushed > 0:
+                yield data[:flushed]
+                data[:size - flushed] = data[flushed:size]
+                size -= flushed
+            if size + length >= len(data):
+                data.extend(bytes(size + length + 1 - len(data)))
+
+        size = lz77_decode(data, size, offset, length, char)
+        i += length + 1
+        if timed:
+            copy_time += lzstats.clock() - read
+
+    # Stage Timing (chars given out are timed by the caller)
+    if timed:
+        lzstats.add("bit reading", read_time)
+        lzstats.add("copying", copy_time)
 
+    # Remaining chars (the whole buffer as it is if it is full)
+    if size > 0:
+        yield data if size == len(data) else data[:size]
 
-def update_container(container, encoded, current):
+
+def decode_data(reader, data_length, huffman_table):
     """
-    Update the container with the next byte when it reaches 0
+    Decodes the LZ77 encoded data into a preallocated buffer of the file length
 
-    :param container: Current byte in iteration
-    :param encoded: Encoded data
-    :param current: Current byte index
-    :return: Updated container, encoded, and current
+    :param reader: BitReader of encoded data
+    :param data_length: Length of File Data
+    :param huffman_table: Lookup Table of Huffman Key
+    :return: Decoded data as bytearray of char codes
     """
-    if len(container) == 0:
-        if current < len(encoded) - 1:
-            current += 1
-            container = BitArray(encoded[current], 8)
-    return container, encoded, current
+    data = bytearray()
+    for data in iter_data(reader, data_length, huffman_table, data_length):
+        pass
+    return data
 
 
-def main(encoded):
+def main(encoded, workers=None):
     """
     Main Method. Decodes a binary file using the LZ77 decoding algorithm, Elias Omega Code, and Huffman Code
 
     :param encoded: Encoded file data
-    :return: Original File Name and File Data
+    :param workers: Number of worker processes for block containers (Default to number of CPUs)
+    :return: Original File Name and File Data (bytes for binary files)
+    """
+    # Important Variables (skip format header if any)
+    version = lzformat.version(encoded)
+    canonical = lzformat.flags(encoded) & lzformat.CANONICAL != 0
+    binary = lzformat.flags(encoded) & lzformat.BYTES != 0
+    reader = BitReader(encoded)
+    if version == lzformat.ARCHIVE:
+        raise ValueError("Archives hold many files, use extract_archive")
+    if version != 0:
+        reader.skip(len(lzformat.header(version)) << 3)
+
+    # Skip Window and Lookahead Sizes
+    if version in (lzformat.STREAM, lzformat.BLOCKS, lzformat.INDEXED):
+        elias_decode(reader)
+        elias_decode(reader)
+
+    # Block container: decode blocks in parallel
+    if version in (lzformat.BLOCKS, lzformat.INDEXED):
+        if version == lzformat.BLOCKS:
+            name, data_length, blocks = decode_index(reader)
+        else:
+            name = decode_name(reader)
+            index = int.from_bytes(encoded[-8:], "big")
+            blocks, offsets = decode_offsets(BitReader(encoded[index:-8]), index)
+        data = decode_blocks([encoded[start:end] for start, end in blocks], workers, canonical, binary)
+        return name, (b"" if binary else "").join(data)
+
+    # Get File Name, File Data Length, and Huffman Encoding
+    name, data_length, huffman_table = decode_header(reader, canonical)
+
+    # Uncompress File Data using LZ77
+    data = decode_data(reader, data_length, huffman_table)
+
+    # Done
+    return name, join_data(data, binary)
+
+
+def open_stream(file, chunk_size=1 << 20, workers=None):
+    """
+    Reads the header of a binary file and starts decoding it a chunk at a time. Decoded chars are given out as soon as
+    they slide out of the window, or a block at a time for block containers. Files in the original format do not store
+    the window size, so all of their data is given out at the end.
+
+    :param file: Binary file (seekable for block containers)
+    :param chunk_size: Number of bytes read at a time, and number of chars decoded past the window before giving them
+                       out
+    :param workers: Number of worker processes for block containers (Default to number of CPUs)
+    :return: Original File Name, whether the file is bytes, and Generator of decoded chunks (str, or bytes if binary)
+    """
+    # Important Variables (read format header if any)
+    header = file.read(len(lzformat.MAGIC) + 1)
+    version = lzformat.version(header)
+    canonical = lzformat.flags(header) & lzformat.CANONICAL != 0
+    binary = lzformat.flags(header) & lzformat.BYTES != 0
+    if version == lzformat.ARCHIVE:
+        raise ValueError("Archives hold many files, use extract_archive")
+    reader = BitReader(file, chunk_size, header)
+    if version != 0:
+        reader.skip(len(header) << 3)
+    window = None
+
+    # Get Window Size
+    if version in (lzformat.STREAM, lzformat.BLOCKS, lzformat.INDEXED):
+        window = elias_decode(reader)
+        elias_decode(reader)
+
+    # Block container: read blocks one at a time and give them out in order as the workers finish them
+    if version in (lzformat.BLOCKS, lzformat.INDEXED):
+        if version == lzformat.BLOCKS:
+            name, data_length, blocks = decode_index(reader)
+        else:
+            name = decode_name(reader)
+            blocks, offsets = read_offsets(file)
+        blocks = (read_block(file, start, end) for start, end in blocks)
+        return name, binary, decode_blocks(blocks, workers, canonical, binary)
+
+    # Get File Name, File Data Length, and Huffman Encoding
+    name, data_length, huffman_table = decode_header(reader, canonical)
+    if window is None:
+        window = data_length
+
+    # Uncompress File Data using LZ77
+    chunks = iter_data(reader, data_length, huffman_table, window, chunk_size)
+    return name, binary, (join_data(chunk, binary) for chunk in chunks)
+
+
+def iter_decompress(fileobj, chunk_size=1 << 20, workers=None):
+    """
+    Iterator variant of main that decodes a binary file a chunk at a time, so the start of the file can be used before
+    the rest has been decoded (see open_stream)
+
+    :param fileobj: Binary file (seekable for block containers)
+    :param chunk_size: Number of bytes read at a time, and number of chars decoded past the window before giving them
+                       out
+    :param workers: Number of worker processes for block containers (Default to number of CPUs)
+    :return: Generator of decoded chunks (str, or bytes for binary files)
+    """
+    _, _, chunks = open_stream(fileobj, chunk_size, workers)
+    yield from chunks
+
+
+async def aiter_decompress(fileobj, chunk_size=1 << 20, workers=None, executor=None):
+    """
+    Asynchronous variant of iter_decompress. Every chunk is decoded in a thread pool so the event loop can keep
+    running, e.g. to process the previous chunk.
+
+    :param fileobj: Binary file (seekable for block containers)
+    :param chunk_size: Number of bytes read at a time, and number of chars decoded past the window before giving them
+                       out
+    :param workers: Number of worker processes for block containers (Default to number of CPUs)
+    :param executor: concurrent.futures Executor to decode in (Default to the default executor of the event loop)
+    :return: Asynchronous generator of decoded chunks (str, or bytes for binary files)
+    """
+    loop = asyncio.get_running_loop()
+    chunks = iter_decompress(fileobj, chunk_size, workers)
+    while True:
+        chunk = await loop.run_in_executor(executor, next, chunks, None)
+        if chunk is None:
+            break
+        yield chunk
+
+
+def main_stream(filename, chunk_size=1 << 20, workers=None):
+    """
+    Streaming variant of main that decodes a binary file straight into the original file. The binary file is read a
+    chunk at a time and decoded chars are written as soon as they slide out of the window, so memory is bounded by the
+    window and chunk size instead of the file size. Files in the original format do not store the window size, so all
+    of their data is kept in memory.
+
+    :param filename: Name of binary file
+    :param chunk_size: Number of bytes read at a time
+    :param workers: Number of worker processes for block containers (Default to number of CPUs)
+    :return: Original File Name
     """
     # Important Variables
-    current = 0
-    container = BitArray(encoded[current], 8)
+    file = open(filename, "rb")
+    name, binary, chunks = open_stream(file, chunk_size, workers)
 
-    # Get File Name Length (We always update container after decoding)
-    container, encoded, current, name_length = elias_decode(container, encoded, current)
+    # Uncompress File Data, writing as we go
+    output = open(name, "wb") if binary else open(name, "w", encoding="utf-8")
+    for chunk in chunks:
+        output.write(chunk)
 
-    # Uncompress File Name
-    name = []
-    for _ in range(name_length):
-        # Get current char
-        char_index = 0
-        p = 7
-        while p > -1:
-            char_index += container[0] << p
-            p -= 1
-            container.contract(1)
-            container, encoded, current = update_container(container, encoded, current)
-        name.append(chr(char_index))
-    # Join chars
-    name = "".join(name)
+    # Done
+    output.close()
+    file.close()
+    return name
 
-    # Get File Data Length and Number of Distinct Chars
-    container, encoded, current, data_length = elias_decode(container, encoded, current)
-    container, encoded, current, distinct_chars = elias_decode(container, encoded, current)
 
-    # Get Huffman Encoding Key
-    huffman_key = []
-    for _ in range(distinct_chars):
-        # Get char
-        char_index = 0
-        p = 7
-        while p > -1:
-            char_index += container[0] << p
-            p -= 1
-            container.contract(1)
-            container, encoded, current = update_container(container, encoded, current)
-
-        # Get length of code
-        container, encoded, current, code_length = elias_decode(container, encoded, current)
-
-        # Get code
-        code = BitArray(0, 0)
-        for _ in range(code_length):
-            code.append(BitArray(container[0], 1))
-            container.contract(1)
-            container, encoded, current = update_container(container, encoded, current)
-
-        # Add data to key
-        huffman_key.append((chr(char_index), code))
-
-    # Compute the Binary Tree
-    huffman_tree = CharTree(huffman_key)
+def decompress_range(path, start, end, workers=None):
+    """
+    Decodes part of an indexed file (written by myzip.main_indexed). Only the blocks covering the range are read and
+    decoded, found through the block index at the end of the file.
+
+    :param path: Name of binary file
+    :param start: Offset of the first char (or byte for binary files) of the range in the original file
+    :param end: Offset after the last char of the range (clipped to the file length)
+    :param workers: Number of worker processes (Default to number of CPUs)
+    :return: Chars in range (bytes for binary files)
+    """
+    # Important Variables
+    file = open(path, "rb")
+    header = file.read(len(lzformat.MAGIC) + 1)
+    if lzformat.version(header) != lzformat.INDEXED:
+        file.close()
+        raise ValueError("".join([path, " is not an indexed file"]))
+    canonical = lzformat.flags(header) & lzformat.CANONICAL != 0
+    binary = lzformat.flags(header) & lzformat.BYTES != 0
+
+    # Find the blocks overlapping the range
+    blocks, offsets = read_offsets(file)
+    first = bisect.bisect_right(offsets, start) - 1
+    last = bisect.bisect_left(offsets, end)
+
+    # Decode only those blocks
     data = []
+    if start < end and first < len(blocks):
+        ranges = blocks[max(first, 0):min(last, len(blocks))]
+        data = decode_blocks([read_block(file, block_start, block_end) for block_start, block_end in ranges], workers,
+                             canonical, binary)
+    data = (b"" if binary else "").join(data)
+    file.close()
 
-    # Uncompress File Data using LZ77
-    i = 0
-    while i < data_length:
-        container, encoded, current, offset = elias_decode(container, encoded, current)
-        container, encoded, current, length = elias_decode(container, encoded, current)
-        container, encoded, current, char = huffman_decode(container, encoded, current, huffman_tree)
-        data = lz77_decode(data, offset, length, char)
-        i += length + 1
+    # Cut the range out of the decoded blocks
+    start = max(start, 0)
+    skipped = offsets[max(first, 0)]
+    return data[start - skipped:end - skipped]
+
+
+def read_directory(file):
+    """
+    Reads the central directory of an archive, whose offset is stored in the last 8 bytes
+
+    :param file: Binary file
+    :return: List of (name, start, end, length) of the entries: the byte range of each in the file and its length
+    """
+    # Read the Central Directory
+    file.seek(-8, os.SEEK_END)
+    end = file.tell()
+    directory = int.from_bytes(file.read(8), "big")
+    reader = BitReader(read_block(file, directory, end))
+
+    # Get Entry Names, Sizes, and Lengths (names are stored as their UTF-8 bytes)
+    entry_count = elias_decode(reader)
+    entries = []
+    for _ in range(entry_count):
+        name = decode_name(reader).encode("latin-1").decode("utf-8")
+        size = elias_decode(reader)
+        entries.append([name, size, elias_decode(reader)])
+
+    # Entries end at the Central Directory
+    start = directory - sum(size for _, size, _ in entries)
+    for entry in entries:
+        entry[1:2] = [start, start + entry[1]]
+        start = entry[2]
 
     # Done
-    return name, "".join(data)
+    return [tuple(entry) for entry in entries]
+
+
+def read_archive(file):
+    """
+    Reads the header of an archive (the shared Huffman encoding) and its central directory
+
+    :param file: Binary file
+    :return: Lookup Table of Huffman Key, and the entries as in read_directory
+    """
+    # Check Version
+    file.seek(0)
+    header = file.read(len(lzformat.MAGIC) + 1)
+    if lzformat.version(header) != lzformat.ARCHIVE:
+        raise ValueError("Not an archive")
+
+    # Skip Window and Lookahead Sizes, and get Shared Huffman Encoding
+    reader = BitReader(file, 1 << 12)
+    elias_decode(reader)
+    elias_decode(reader)
+    huffman_table = decode_huffman(reader, lzformat.flags(header) & lzformat.CANONICAL != 0)
+
+    # Done
+    return huffman_table, read_directory(file)
+
+
+def decode_entry(entry, huffman_table):
+    """
+    Decodes an entry of an archive
+
+    :param entry: Compressed Entry
+    :param huffman_table: Lookup Table of the Shared Huffman Key
+    :return: File Contents as bytes
+    """
+    reader = BitReader(entry)
+    data_length = elias_decode(reader)
+    return bytes(decode_data(reader, data_length, huffman_table))
+
+
+def entry_path(name, directory="."):
+    """
+    Gets the path an entry is extracted to, refusing names that would end up outside the directory
+
+    :param name: Entry Name
+    :param directory: Directory to extract to
+    :return: Path of file
+    """
+    parts = name.split("/")
+    if name.startswith("/") or ".." in parts or ":" in parts[0]:
+        raise ValueError("".join(["Unsafe entry name ", name]))
+    return os.path.join(directory, *parts)
+
+
+def write_entry(path, contents):
+    """
+    Writes an extracted entry, creating the directories it is in
+
+    :param path: Path of file
+    :param contents: File Contents as bytes
+    """
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_output(path, contents)
+
+
+def list_archive(path):
+    """
+    Lists the entries of an archive from its central directory alone
+
+    :param path: Name of archive
+    :return: List of (name, length) of the entries
+    """
+    file = open(path, "rb")
+    if lzformat.version(file.read(len(lzformat.MAGIC) + 1)) != lzformat.ARCHIVE:
+        file.close()
+        raise ValueError("".join([path, " is not an archive"]))
+    entries = read_directory(file)
+    file.close()
+    return [(name, length) for name, _, _, length in entries]
+
+
+def extract_entry(path, name):
+    """
+    Decodes a single entry of an archive, reading only the header, the central directory, and that entry
+
+    :param path: Name of archive
+    :param name: Entry Name
+    :return: File Contents as bytes
+    """
+    file = open(path, "rb")
+    huffman_table, entries = read_archive(file)
+    for entry_name, start, end, _ in entries:
+        if entry_name == name:
+            data = decode_entry(read_block(file, start, end), huffman_table)
+            file.close()
+            return data
+    file.close()
+    raise KeyError(name)
+
+
+def extract_archive(path, directory=".", workers=None):
+    """
+    Decodes every entry of an archive into files under a directory, in a pool of worker processes
+
+    :param path: Name of archive
+    :param directory: Directory to extract to
+    :param workers: Number of worker processes (Default to number of CPUs)
+    :return: List of the names of the entries
+    """
+    # Important Variables
+    workers = workers or os.cpu_count() or 1
+    file = open(path, "rb")
+    huffman_table, entries = read_archive(file)
+    paths = [entry_path(name, directory) for name, _, _, _ in entries]
+    decode = functools.partial(decode_entry, huffman_table=huffman_table)
+    blocks = (read_block(file, start, end) for _, start, end, _ in entries)
+
+    # Decode Entries (in order)
+    pool = None
+    try:
+        if workers == 1:
+            decoded = map(decode, blocks)
+        else:
+            pool = multiprocessing.Pool(workers)
+            decoded = pool.imap(decode, blocks, 16)
+
+        # Write Entries
+        for entry_file, data in zip(paths, decoded):
+            write_entry(entry_file, data)
+
+    # Done (workers are stopped even if an entry could not be decoded or written)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        file.close()
+    return [name for name, _, _, _ in entries]
 
 
 if __name__ == "__main__":
     # Read Inputs
-    compressed_name = sys.argv[1]
-    encoded_data = read_input(compressed_name)
+    parser = argparse.ArgumentParser(description="Decodes a binary file encoded by myzip.")
+    parser.add_argument("file_name", help="Binary file to decode, written to the original file name")
+    parser.add_argument("--stream", action="store_true",
+                        help="Read and write the file in chunks, keeping only the window in memory")
+    parser.add_argument("--chunk-size", type=int, default=1 << 20, help="Bytes read at a time with --stream")
+    parser.add_argument("--workers", type=int, help="Worker processes for block containers (Default to number of CPUs)")
+    parser.add_argument("--range", type=int, nargs=2, metavar=("START", "END"),
+                        help="Print only chars START to END of an indexed file instead of writing the whole file")
+    parser.add_argument("--list", action="store_true", help="List the entries of an archive")
+    parser.add_argument("--extract", metavar="NAME", help="Extract only this entry of an archive")
+    parser.add_argument("--stats", action="store_true", help="Print the time spent in each stage")
+    args = parser.parse_args()
+    lzstats.enabled = args.stats
+    start_time = lzstats.clock()
 
     # Uncompress and Write
-    file_name, file_data = main(encoded_data)
-    write_output(file_name, file_data)
+    if args.list:
+        for entry_name, entry_length in list_archive(args.file_name):
+            print(entry_length, entry_name)
+    elif args.extract:
+        write_entry(entry_path(args.extract), extract_entry(args.file_name, args.extract))
+    elif lzformat.version(read_input(args.file_name, len(lzformat.MAGIC) + 1)) == lzformat.ARCHIVE:
+        extract_archive(args.file_name, ".", args.workers)
+    elif args.range:
+        file_data = decompress_range(args.file_name, args.range[0], args.range[1], args.workers)
+        if isinstance(file_data, bytes):
+            sys.stdout.buffer.write(file_data)
+        else:
+            sys.stdout.write(file_data)
+    elif args.stream:
+        main_stream(args.file_name, args.chunk_size, args.workers)
+    else:
+        encoded_data = read_input(args.file_name)
+        file_name, file_data = main(encoded_data, args.workers)
+        write_output(file_name, file_data)
+
+    # Print Stage Timing
+    if args.stats:
+        lzstats.report(lzstats.clock() - start_time)
@@ -5,185 +5,147 @@ and storing characters using Huffman Encoding.
 
 __author__ = "Arthur Lee"
 
-import sys
+import os
+import mmap
 import heapq
+import random
+import hashlib
+import argparse
+import functools
+import multiprocessing
+from array import array
+from collections import Counter
 
+import lzformat
+import lzstats
+from bitio import BitArray, BitWriter
 
-def read_input(filename):
+
+def read_input(filename, binary=False):
     """
-    Reads the contents of a file
+    Reads the contents of a file. Binary files are memory mapped instead of read, so they are paged in as the encoder
+    goes instead of being copied into memory.
 
     :param filename: Name of file
-    :return: File contents
+    :param binary: Whether to read the file as bytes instead of UTF-8 text
+    :return: File contents (str, or mmap of the bytes)
     """
+    # Map binary files (an empty file cannot be mapped)
+    if binary:
+        file = open(filename, "rb")
+        if os.fstat(file.fileno()).st_size == 0:
+            contents = b""
+        else:
+            contents = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        file.close()
+        return contents
+
     file = open(filename, "r", encoding="utf-8")
     contents = file.read()
     file.close()
     return contents
 
 
-def write_output(filename, compressed):
+def read_chunks(filename, chunk_size, binary=False):
     """
-    Writes the compressed bytearray into a binary file
+    Reads the contents of a file a chunk at a time
 
-    :param filename: Name of original file
-    :param compressed: Compressed data as bytearray
+    :param filename: Name of file
+    :param chunk_size: Number of chars (or bytes) per chunk
+    :param binary: Whether to read the file as bytes instead of UTF-8 text
+    :return: Generator of chunks
     """
-    file = open("".join([filename, ".bin"]), "wb")
-    file.write(compressed)
+    if binary:
+        file = open(filename, "rb")
+    else:
+        file = open(filename, "r", encoding="utf-8")
+    chunk = file.read(chunk_size)
+    while len(chunk) != 0:
+        yield chunk
+        chunk = file.read(chunk_size)
     file.close()
 
 
-class BitArray:
+def gear_table(seed=0x4C5A37):
     """
-    Wrapper Class to deal with binary operations
-    """
-    def __init__(self, bits, length=None):
-        """
-        We store bits as an integer but mark the area we are interested in with a length.
-
-        :param bits: Bits stored as integer
-        :param length: Length of bit array (from LSB)
-        """
-        self.length = length if length is not None else self.bit_length(bits)
-        self.bits = bits & ((1 << self.length) - 1)
-
-    @staticmethod
-    def bit_length(n):
-        """
-        Compute the bit length of an int.
-
-        :param n: Integer
-        :return: Number of bits in minimal binary code of n
-        """
-        d = 0
-        while n > 0:
-            d += 1
-            n >>= 1
-        return d
-
-    def __len__(self):
-        """
-        Get the length of the BitArray
-
-        :return: Length of BitArray
-        """
-        return self.length
-
-    def __int__(self):
-        """
-        Convert the BitArray to int by returning the bits
-
-        :return: BitArray as int
-        """
-        return self.bits
-
-    def __str__(self):
-        """
-        Get the BitArray as a binary string for display purposes
-
-        :return: Bit string of BitArray
-        """
-        string = ""
-        for i in range(len(self)):
-            string += str(self[i])
-        return string
-
-    def ascii(self):
-        """
-        Get the ASCII representation of the BitArray if possible
-
-        :return:
-        """
-        if self.length == 8:  # If the length is 8, we can obtain the ASCII char represented by the int
-            return chr(int(self))
-        else:
-            raise ValueError("Bit length must be 8")
-
-    def __getitem__(self, item):
-        """
-        Get a bit at a certain index by shifting and masking
-
-        :param item: Index
-        :return: Bit at index
-        """
-        return (self.bits >> (self.length - item - 1)) & 1
+    Generates the random value of every byte used by the gear rolling hash. The seed is fixed so chunk boundaries are
+    the same on every run.
 
-    def __setitem__(self, key, value):
-        """
-        Set a bit at a certain index by shifting and masking
-
-        :param key: Index
-        :param value: Bit to set
-        """
-        if value:   # Bit = 1
-            value <<= (self.length - key - 1)
-            self.bits |= value
-        else:   # Bit = 0
-            value = True
-            value <<= (self.length - key - 1)
-            self.bits &= ~value
-
-    def get_slice(self, start, end):
-        """
-        Get a slice of the bit from start to end (inclusive) using shifting and masking
-
-        :param start: Start of slice
-        :param end: End of slice
-        :return: Slice as a BitArray
-        """
-        new_bits = self.bits >> (self.length - end - 1)
-        new_bits &= (1 << (end - start + 1)) - 1
-        new_length = end - start + 1
-        return BitArray(new_bits, new_length)
-
-    def prepend(self, other):
-        """
-        Prepend another BitArray to the front
+    :param seed: Random seed
+    :return: List of 256 random 64-bit values
+    """
+    generator = random.Random(seed)
+    return [generator.getrandbits(64) for _ in range(256)]
 
-        :param other: Another BitArray
-        """
-        other.bits <<= self.length
-        self.bits |= other.bits
-        self.length += other.length
 
-    def append(self, other):
-        """
-        Append another BitArray to the back
+GEAR = gear_table()
 
-        :param other: Another BitArray
-        """
-        self.bits <<= other.length
-        self.bits |= other.bits
-        self.length += other.length
 
-    def extend(self, n):
-        """
-        Pads n 0s to the back of BitArray
+def cdc_chunks(chunks, average=1 << 16):
+    """
+    Content-Defined Chunking: splits a text given in chunks where a gear rolling hash of the chars since the last
+    boundary has its top bits all 0. Boundaries only depend on the nearby chars, so an edit only changes the chunks
+    around it and the chunks after it come out the same as before.
 
-        :param n: Length of extension
-        """
-        self.bits <<= n
-        self.length += n
+    :param chunks: Iterable of strings (or bytes) making up the text
+    :param average: Approximate average chunk size (chunks are between a quarter and 4 times this long)
+    :return: Generator of chunks
+    """
+    # Important Variables
+    minimum = max(1, average >> 2)
+    maximum = average << 2
+    bits = max(1, (average - minimum).bit_length() - 1)
+    mask = ((1 << bits) - 1) << (64 - bits)
+    full = (1 << 64) - 1
+    pending = ""
+    scanned = 0     # Chars of pending already hashed
+    h = 0
 
-    def contract(self, n):
-        """
-        Shortens the BitArray without changing anything
+    # Loop through text
+    for chunk in chunks:
+        pending = pending + chunk if len(pending) != 0 else chunk
+        while True:
+            # Hash from the minimum chunk size until a boundary, the maximum chunk size, or the end of pending
+            scanned = max(scanned, minimum)
+            end = min(len(pending), maximum)
+            values = pending[scanned:end]
+            boundary = -1
+            for value in (map(ord, values) if isinstance(values, str) else values):
+                h = ((h << 1) + GEAR[value & 0xFF]) & full
+                scanned += 1
+                if h & mask == 0:
+                    boundary = scanned
+                    break
+
+            # Cut at the maximum chunk size if no boundary was found before it
+            if boundary < 0 and scanned >= maximum:
+                boundary = maximum
+
+            # Need more chars
+            if boundary < 0:
+                break
+
+            # Start the next chunk
+            yield pending[:boundary]
+            pending = pending[boundary:]
+            scanned = 0
+            h = 0
+
+    # Last chunk
+    if len(pending) != 0:
+        yield pending
 
-        :param n: Length of contraction
-        """
-        self.length -= n
-        self.bits &= ((1 << self.length) - 1)
 
-    def to_bytes(self):
-        """
-        Converts 1st 8 bits in BitArray to bytearray representation
+def write_output(filename, compressed):
+    """
+    Writes the compressed bytearray into a binary file
 
-        :return: BitArray as bytearray
-        """
-        byte_array = int(self.get_slice(0, 7))
-        self.contract(8)
-        return byte_array
+    :param filename: Name of original file
+    :param compressed: Compressed data as bytearray
+    """
+    file = open("".join([filename, ".bin"]), "wb")
+    file.write(compressed)
+    file.close()
 
 
 def elias_encode(n, start=0):
@@ -192,22 +154,46 @@ def elias_encode(n, start=0):
 
     :param n: Integer >= start
     :param start: Start point of Elias Code (Default to 0)
-    :return: Elias Omega Code of n as bitarray
+    :return: Elias Omega Code of n as (code as int, code length)
     """
     # Shift n according to start point and initialise code
     n -= start - 1
-    current = BitArray(n)
-    code = BitArray(n)
+    code = n
+    length = n.bit_length()
 
-    # Compute L_i - 1 until 1 reached
+    # Compute L_i - 1 until 1 reached, prepending each with its leading bit set to 0
     while n > 1:
-        n = len(current) - 1
-        current = BitArray(n)
-        current[0] = 0
-        code.prepend(current)
+        n = n.bit_length() - 1
+        code |= (n & ~(1 << (n.bit_length() - 1))) << length
+        length += n.bit_length()
 
     # Done
-    return code
+    return code, length
+
+
+@functools.lru_cache(maxsize=None)
+def elias_table(size):
+    """
+    Gets the Elias Omega Codes of every integer from 0 to size. Offsets and lengths are bounded by the window and
+    lookahead, so each token's integers are a lookup in this table. Codes of integers with the same bit length all
+    start with the same prefix, so the table is built a group at a time.
+
+    :param size: Largest integer in the table
+    :return: array of (code << 6) | code length, indexed by integer
+    """
+    # Important Variables
+    table = array("Q")
+
+    # Integers n + 1 in [2^(k-1), 2^k) share the prefix before their k bits
+    for k in range(1, (size + 1).bit_length() + 1):
+        code, length = elias_encode((1 << (k - 1)) - 1)
+        prefix = (code >> k) << k
+        first = 1 << (k - 1)
+        last = min(1 << k, size + 2)
+        table.extend(((prefix | m) << 6) | length for m in range(first, last))
+
+    # Done
+    return table
 
 
 class CharInfo:
@@ -245,22 +231,29 @@ class CharInfo:
             return len(self.char) < len(other.char)
 
 
-def huffman_encode(text):
+def huffman_encode(text, counts=None, canonical=False):
     """
     Generates a Huffman Code from a given text and encodes the text using the computed Huffman Code.
 
-    :param text: String to encode
+    :param text: String (or bytes) to encode
+    :param counts: Counter of chars in text if already counted (e.g. chunk by chunk), in which case text is ignored
+    :param canonical: Whether to reassign the codes as canonical codes of the same lengths
     :return: The encoded text and its encoding
     """
     # Important Variables
+    started = lzstats.clock()
     code = [0] * 256
     chars = []
 
-    # Compute Frequencies of every char in text
-    for char in text:
-        if code[ord(char)] == 0:
-            chars.append(char)
-        code[ord(char)] += 1
+    # Compute Frequencies of every char in text (Counter keeps chars in order of first occurrence)
+    if counts is None:
+        counts = Counter(text if isinstance(text, str) else memoryview(text))
+    for char, freq in counts.items():
+        # Bytes are counted as ints, use the char of the same code
+        if isinstance(char, int):
+            char = chr(char)
+        chars.append(char)
+        code[ord(char)] = freq
 
     # Collect chars who have occurred at least once
     for i in range(len(chars)):
@@ -293,9 +286,36 @@ def huffman_encode(text):
         heapq.heappush(chars, cset)
 
     # Done
+    if canonical:
+        code = canonical_encode(code)
+    lzstats.add("huffman build", lzstats.clock() - started)
     return code
 
 
+def canonical_encode(code):
+    """
+    Reassigns a Huffman Code as the canonical code with the same code lengths: chars sorted by code length then char
+    get consecutive codes, shifted left whenever the length grows. Only the lengths are then needed to rebuild it.
+
+    :param code: Huffman code
+    :return: Canonical Huffman code
+    """
+    # Important Variables
+    canonical = [BitArray(0, 0) for _ in range(len(code))]
+    value = 0
+    previous = 0
+
+    # Assign codes in order of length then char
+    for length, i in sorted((len(code[i]), i) for i in range(len(code)) if len(code[i]) != 0):
+        value <<= length - previous
+        canonical[i] = BitArray(value, length)
+        value += 1
+        previous = length
+
+    # Done
+    return canonical
+
+
 def huffman_data(code):
     """
     Extracts the chars that exist in file data from huffman code
@@ -430,10 +450,354 @@ def z_algo(string, start, current, end):
         length -= 1
 
     # Done
-    return current - index, length, string[current + length]
+    return current - index, length, string[current + length:current + length + 1]
+
+
+def match_length(text, i, j, limit):
+    """
+    Computes the length of the longest common prefix of text[i:i+limit] and text[j:j+limit]. Chars are compared in
+    slices of doubling size and the first mismatching slice is narrowed down with a binary search.
+
+    :param text: String to check
+    :param i: Starting index of first substring
+    :param j: Starting index of second substring
+    :param limit: Maximum length to compare
+    :return: Length of common prefix (0 if no common prefix)
+    """
+    # Important Variables
+    count = 0
+    step = 8
+
+    # Gallop through equal slices
+    while count < limit:
+        size = min(step, limit - count)
+        if text[i + count:i + count + size] == text[j + count:j + count + size]:
+            count += size
+            step <<= 1
+
+        # Mismatch lies within this slice, binary search for it
+        else:
+            while size > 1:
+                half = size >> 1
+                if text[i + count:i + count + half] == text[j + count:j + count + half]:
+                    count += half
+                    size -= half
+                else:
+                    size = half
+            break
+
+    # Done
+    return count
+
+
+class MatchFinder:
+    """
+    Persistent match finder for LZ77 encoding. Positions are inserted as the encoder moves past them, so a search only
+    looks up earlier positions that can give a long match instead of rebuilding a Z-array over the whole window for
+    every triple. Short matches are found from the latest occurrence of every substring shorter than the gram length,
+    longer ones by following hash chains of positions sharing the same gram.
+
+    The matches found are identical to those of the Z-algorithm over lookahead + window: the longest match wins (a
+    match covering the whole lookahead keeps comparing against the start of the window) and ties go to the closest
+    position.
+
+    Positions are absolute, text may be a buffer holding only part of the text (see slide) as long as it holds the
+    window before and the lookahead (plus next char) after the current position.
+    """
+    def __init__(self, text, window, lookahead, max_chain=32, max_search=8, gram=8, exact=True):
+        """
+        Constructor. Chains are stored in a ring of window + 1 slots as only positions within the window are ever
+        followed.
+
+        :param text: String to encode
+        :param window: Window size
+        :param lookahead: Lookahead Buffer Size
+        :param max_chain: Number of chain links followed before switching to a substring search for the remainder
+        :param max_search: Number of longer matches searched for before switching to the Z-algorithm for the remainder
+        :param gram: Length of substrings the chains are keyed by (capped by the lookahead)
+        :param exact: Whether to search the rest of the window when the chain is cut off, so matches are always the
+                      longest. Otherwise only the first max_chain links are looked at.
+        """
+        self.text = text
+        self.base = 0   # Position of text[0]
+        self.window = window
+        self.lookahead = lookahead
+        self.max_chain = max_chain
+        self.exact = exact
+        self.max_search = max_search
+        self.gram = max(1, min(gram, lookahead))
+        self.size = window + 1
+        self.chain = [-1] * self.size                   # Previous position with the same gram
+        self.head = {}                                  # Latest position of every gram
+        self.last = [{} for _ in range(self.gram - 1)]  # Latest position of every shorter substring, by length - 1
+        self.inserted = 0                               # Positions before this have been inserted
+        self.pruned = 0                                 # Position at which stale entries were last removed
+
+    def slide(self, text, base):
+        """
+        Replaces the text with a new buffer of it
+
+        :param text: Buffer of text
+        :param base: Position of text[0]
+        """
+        self.text = text
+        self.base = base
+
+    def insert(self, position):
+        """
+        Inserts every position up to (but excluding) position
+
+        :param position: Position to insert up to
+        """
+        # Important Variables
+        text, base = self.text, self.base
+        chain, head, last = self.chain, self.head, self.last
+        gram, size = self.gram, self.size
+        n = len(text)
+
+        # Loop through new positions (p is an index in text)
+        p = self.inserted - base
+        while p < position - base:
+            if p + gram <= n:
+                key = text[p:p + gram]
+                chain[(p + base) % size] = head.get(key, -1)
+                head[key] = p + base
+            for k in range(1, min(gram, n - p + 1)):
+                last[k - 1][text[p:p + k]] = p + base
+            p += 1
+        p = self.inserted = p + base
+
+        # Remove entries that have slid out of the window so memory stays bounded by the window
+        if p - self.pruned > max(self.size, 1 << 16):
+            start = p - self.window
+            for table in [head] + last:
+                for key in [key for key, value in table.items() if value < start]:
+                    del table[key]
+            self.pruned = p
+
+    def z_value(self, p, current, start, end):
+        """
+        Computes the Z value of window position p, i.e. the length of the longest common prefix of text[p:end+1] and
+        the lookahead followed by the window
+
+        :param p: Window position
+        :param current: Current Index
+        :param start: Left buffer of sliding window
+        :param end: Right buffer of sliding window
+        :return: Z value of p
+        """
+        lookahead = end - current + 1
+        z = match_length(self.text, p, current, lookahead)
+        if z == lookahead:
+            z += match_length(self.text, start, p + lookahead, end - p - lookahead + 1)
+        return z
+
+    def needle(self, current, start, end, length):
+        """
+        Gets the first length chars of the lookahead followed by the window (the string Z values are computed against)
+
+        :param current: Current Index
+        :param start: Left buffer of sliding window
+        :param end: Right buffer of sliding window
+        :param length: Length of prefix
+        :return: Prefix of lookahead + window
+        """
+        lookahead = end - current + 1
+        if length <= lookahead:
+            return self.text[current:current + length]
+        return self.text[current:end + 1] + self.text[start:start + length - lookahead]
+
+    def find(self, current):
+        """
+        Finds the longest match for the lookahead starting at current, with ties going to the closest position. Every
+        position before current must have been inserted.
+
+        :param current: Current Index
+        :return: Offset, length, and next char (as a slice of text, so bytes give a bytes object rather than an int)
+        """
+        # Important Variables (indices are in text)
+        text, base = self.text, self.base
+        current -= base
+        start = max(0, current - self.window)
+        end = min(len(text) - 1, current + self.lookahead - 1)
+        lookahead = end - current + 1
+        best, index = 0, -1
+        below = -1  # Positions below this still have to be searched
+
+        # No lookahead, nothing to match
+        if lookahead <= 0:
+            return 0, 0, text[current:current + 1]
+
+        # Follow the chain of earlier positions sharing the first gram chars, closest first
+        if lookahead >= self.gram:
+            p = self.head.get(text[current:current + self.gram], -1) - base
+            links = self.max_chain
+            target = None
+            while p >= start and links > 0:
+                # A position can only beat the best match if it agrees with it on the next char
+                if target is None or (p + best <= end and text[p + best] == target):
+                    z = self.z_value(p, current, start, end)
+                    if z > best:
+                        best, index = z, p
+                        target = self.needle(current, start, end, best + 1)[-1]
+                p = self.chain[(p + base) % self.size] - base
+                links -= 1
+
+            # Chain cut off early, the rest of the window is searched below
+            if p >= start and self.exact:
+                below = p + 1
+            shorter = self.gram - 1
+
+        # Lookahead is shorter than the gram near the end of the text, search for the whole lookahead instead
+        else:
+            if self.last[lookahead - 1].get(text[current:end + 1], -1) - base >= start:
+                best, below = lookahead - 1, current
+            shorter = lookahead - 1
+
+        # Nothing that long, the best match is the latest occurrence of the longest substring that does occur
+        if index < 0 and below < 0:
+            for length in range(shorter, 0, -1):
+                p = self.last[length - 1].get(text[current:current + length], -1) - base
+                if p >= start:
+                    best, index = length, p
+                    break
+
+        # Search the rest of the window for any longer match, closest first
+        searches = self.max_search
+        while below > start:
+            # Matches keep getting longer (periodic text), computing every Z value at once is cheaper
+            if searches == 0:
+                offset, length, char = z_algo(text, start, current, end)
+                return (offset if length > 0 else 0), length, char
+
+            needle = self.needle(current, start, end, best + 1)
+            q = text.rfind(needle, start, min(below - 1 + len(needle), end + 1))
+            if q < 0:
+                break
+            best, index = self.z_value(q, current, start, end), q
+            below = q
+            searches -= 1
+
+        # Make sure length is within sliding window
+        length = min(lookahead, best) if index >= 0 else 0
+        if current + length >= len(text):
+            length -= 1
+
+        # Done
+        return (current - index if length > 0 else 0), length, text[current + length:current + length + 1]
+
+
+# Compression Levels: match finder settings, parse, and default window and lookahead sizes. Low levels follow a single
+# chain link and take the first match found, high levels follow long chains and choose between matches.
+LEVELS = {
+    1: {"max_chain": 1, "gram": 4, "exact": False, "parse": "greedy", "window": 4096, "lookahead": 16},
+    2: {"max_chain": 2, "gram": 4, "exact": False, "parse": "greedy", "window": 8192, "lookahead": 32},
+    3: {"max_chain": 4, "gram": 6, "exact": False, "parse": "greedy", "window": 16384, "lookahead": 32},
+    4: {"max_chain": 8, "gram": 8, "exact": False, "parse": "greedy", "window": 32768, "lookahead": 64},
+    5: {"max_chain": 16, "gram": 8, "exact": False, "parse": "greedy", "window": 32768, "lookahead": 64},
+    6: {"max_chain": 16, "gram": 8, "exact": False, "parse": "lazy", "window": 65536, "lookahead": 128},
+    7: {"max_chain": 32, "gram": 8, "exact": True, "parse": "lazy", "window": 65536, "lookahead": 128},
+    8: {"max_chain": 32, "gram": 8, "exact": False, "parse": "optimal", "window": 65536, "lookahead": 128},
+    9: {"max_chain": 64, "gram": 8, "exact": True, "parse": "optimal", "window": 1 << 18, "lookahead": 256},
+}
+
+# Number of chars chosen at a time by the optimal parse
+OPTIMAL_SEGMENT = 4096
+
+
+def level_sizes(level, window, lookahead):
+    """
+    Fills in the window and lookahead sizes not given from a compression level
+
+    :param level: Compression Level (None for no level)
+    :param window: Window (or Dictionary) Size, or None for the default of the level
+    :param lookahead: Lookahead Buffer Size, or None for the default of the level
+    :return: Window and Lookahead Sizes
+    """
+    if level is not None:
+        if window is None:
+            window = LEVELS[level]["window"]
+        if lookahead is None:
+            lookahead = LEVELS[level]["lookahead"]
+    if window is None or lookahead is None:
+        raise ValueError("Window and lookahead sizes are needed without a compression level")
+    return window, lookahead
+
+
+def lazy_match(finder, current, match):
+    """
+    Lazy Matching: checks whether the match at current + 1 is long enough that the char at current is better encoded on
+    its own (as a triple with length 0) with the longer match following it
+
+    :param finder: MatchFinder with every position up to current inserted
+    :param current: Current Index
+    :param match: Triple of the match found at current
+    :return: Triple to encode at current, and triple found at current + 1 if it should follow (None otherwise)
+    """
+    # Important Variables
+    offset, length, char = match
+
+    # A match already covering the lookahead cannot be beaten
+    if length == 0 or length >= finder.lookahead:
+        return match, None
+
+    # Look one char ahead
+    finder.insert(current + 1)
+    following = finder.find(current + 1)
+    if following[1] > length:
+        i = current - finder.base
+        return (0, 0, finder.text[i:i + 1]), following
+
+    # Done
+    return match, None
+
+
+def optimal_parse(finder, current, end, codes, char_bits):
+    """
+    Bounded Optimal Parsing: chooses the triples covering text[current:end] that take the least bits. The longest match
+    is found at every position, and any prefix of it (or no match) may be used, so the cheapest way to reach every
+    position is found in one pass from left to right.
+
+    :param finder: MatchFinder with every position up to current inserted
+    :param current: Current Index
+    :param end: End of the chars to parse (exclusive)
+    :param codes: Elias Omega code table from elias_table
+    :param char_bits: Huffman code length of every char index
+    :return: List of triples
+    """
+    # Important Variables (indices are relative to current)
+    text, base = finder.text, finder.base
+    size = end - current
+    segment = text[current - base:end - base]
+    bits = [char_bits[c] for c in (map(ord, segment) if isinstance(segment, str) else segment)]
+    cost = [0] + [float("inf")] * size
+    choice = [None] * (size + 1)    # (previous position, offset, length) of the cheapest triple ending at each one
+
+    # Relax every triple starting at i
+    for i in range(size):
+        finder.insert(current + i)
+        offset, length, _ = finder.find(current + i)
+        offset_bits = codes[offset] & 63
+        for k in range(min(length, size - i - 1) + 1):
+            c = cost[i] + (offset_bits if k > 0 else 1) + (codes[k] & 63) + bits[i + k]
+            if c < cost[i + k + 1]:
+                cost[i + k + 1] = c
+                choice[i + k + 1] = (i, offset if k > 0 else 0, k)
+
+    # Walk back from the end
+    triples = []
+    j = size
+    while j > 0:
+        i, offset, length = choice[j]
+        triples.append((offset, length, segment[j - 1:j]))
+        j = i
+    triples.reverse()
+
+    # Done
+    return triples
 
 
-def lz77_encode(text, window, lookahead, huffman_key, container, encoded):
+def lz77_encode(text, window, lookahead, huffman_key, writer, level=None):
     """
     LZ77 Encoder
 
@@ -441,123 +805,691 @@ def lz77_encode(text, window, lookahead, huffman_key, container, encoded):
     :param window: Window size
     :param lookahead: Lookahead Buffer Size
     :param huffman_key: Huffman encoding generated from char frequencies
-    :param container: BitArray container
-    :param encoded: Encoded file data
-    :return: Updated container and encoded with LZ77 encoded data
+    :param writer: BitWriter to write LZ77 encoded data to
+    :param level: Compression Level (None for the longest match at every triple)
     """
-    # Important Variables
-    current = 0
+    lz77_encode_stream([text], window, lookahead, huffman_key, writer, level)
 
-    # Loop through text
-    while current < len(text):
-        # Get Appropriate Indices
-        start = max(0, current - window)
-        end = min(len(text) - 1, current + lookahead - 1)
 
-        # Get triples values
-        offset, length, char = z_algo(text, start, current, end)
-        if length == 0:
-            offset = 0
+def lz77_encode_stream(chunks, window, lookahead, huffman_key, writer, level=None):
+    """
+    LZ77 Encoder over a text given in chunks. Only the window and lookahead around the current index are kept in a
+    buffer.
 
-        # Update Current and Append
-        current += length + 1
+    :param chunks: Iterable of strings (or bytes) making up the text
+    :param window: Window size
+    :param lookahead: Lookahead Buffer Size
+    :param huffman_key: Huffman encoding generated from char frequencies
+    :param writer: BitWriter to write LZ77 encoded data to
+    :param level: Compression Level (None for the longest match at every triple)
+    """
+    # Important Variables
+    chunks = iter(chunks)
+    buffer = ""     # Replaced by the first chunk
+    base = 0        # Position of buffer[0] in text
+    current = 0
+    exhausted = False
+    codes = elias_table(max(window, lookahead))
+    char_bits = [len(code) for code in huffman_key]
+    following = None    # Match already found at current by lazy matching
+
+    # Match finder settings of the level
+    if level is None:
+        finder = MatchFinder(buffer, window, lookahead)
+        parse = "greedy"
+    else:
+        preset = LEVELS[level]
+        finder = MatchFinder(buffer, window, lookahead, preset["max_chain"], gram=preset["gram"],
+                             exact=preset["exact"])
+        parse = preset["parse"]
+
+    # Chars needed in the buffer past current (beyond the lookahead and next char)
+    ahead = {"greedy": 0, "lazy": 1, "optimal": OPTIMAL_SEGMENT}[parse]
 
-        # Compress Offset
-        container.append(elias_encode(offset))
-        container, encoded = update_container(container, encoded)
+    # Stage Timing
+    timed = lzstats.enabled
+    match_time = emit_time = 0
 
-        # Compress Length
-        container.append(elias_encode(length))
-        container, encoded = update_container(container, encoded)
+    # Loop through text
+    while True:
+        # Keep the lookahead and next char in the buffer, dropping what has slid out of the window
+        while not exhausted and base + len(buffer) - current <= lookahead + ahead:
+            chunk = next(chunks, "")
+            if len(chunk) == 0:
+                exhausted = True
+            else:
+                # Nothing left to keep, use the chunk as it is (a whole mmap input is then never copied)
+                drop = max(0, min(current - window, finder.inserted) - base)
+                buffer = buffer[drop:] + chunk if drop < len(buffer) else chunk
+                base += drop
+                finder.slide(buffer, base)
+
+        # End of text
+        if current >= base + len(buffer):
+            break
 
-        # Compress Char
-        container.append(huffman_key[ord(char)])
-        container, encoded = update_container(container, encoded)
+        # Get triples values
+        if timed:
+            started = lzstats.clock()
+        if parse == "optimal":
+            end = base + len(buffer) if exhausted else current + OPTIMAL_SEGMENT
+            triples = optimal_parse(finder, current, min(end, base + len(buffer)), codes, char_bits)
+        else:
+            finder.insert(current)
+            match = following if following is not None else finder.find(current)
+            following = None
+            if parse == "lazy":
+                match, following = lazy_match(finder, current, match)
+            triples = [match]
+        if timed:
+            found = lzstats.clock()
+            match_time += found - started
+
+        for offset, length, char in triples:
+            # Update Current and Append
+            current += length + 1
+
+            # Compress Offset
+            code = codes[offset]
+            writer.write(code >> 6, code & 63)
+
+            # Compress Length
+            code = codes[length]
+            writer.write(code >> 6, code & 63)
+
+            # Compress Char
+            code = huffman_key[ord(char)]
+            writer.write(code.bits, code.length)
+        if timed:
+            emit_time += lzstats.clock() - found
 
     # Done
-    return container, encoded
+    if timed:
+        lzstats.add("match finding", match_time)
+        lzstats.add("bit emission", emit_time)
 
 
-def update_container(container, encoded):
+def encode_header(name, data_length, huffman_key, writer, canonical=False):
     """
-    Move bits from BitArray container to bytearray encoded until container is length < 8
+    Encodes the file name, file length, and Huffman encoding that precede the LZ77 encoded data
 
-    :param container: BitArray storage
-    :param encoded: Bytearray encoding
-    :return: Update container and encoded
+    :param name: File Name
+    :param data_length: Length of File Contents
+    :param huffman_key: Huffman encoding generated from char frequencies
+    :param writer: BitWriter to write header data to
+    :param canonical: Whether huffman_key is canonical and only its code lengths are stored
     """
-    while len(container) >= 8:
-        encoded.append(container.to_bytes())
-    return container, encoded
+    # Compress File Name
+    encode_name(name, writer)
+
+    # Compress File Length
+    writer.write(*elias_encode(data_length))
+
+    # Compress Huffman Encoding
+    encode_huffman(huffman_key, writer, canonical)
 
 
-def main(name, data, window, lookahead):
+def encode_name(name, writer):
     """
-    Encodes a file using the LZ77 encoding algorithm with Elias Omega Encoding and Huffman Encoding
-    for storing Integers and Characters.
+    Encodes the file name as its length followed by its chars
 
     :param name: File Name
-    :param data: File Contents
-    :param window: Window (or Dictionary) Size
-    :param lookahead: Lookahead Buffer Size
-    :return: Compressed Data as bytearray
+    :param writer: BitWriter to write name to
     """
-    # Important Variables
-    container = BitArray(0, 0)
-    encoded = bytearray()
-
     # Compress Length of File Name
-    container.append(elias_encode(len(name)))
-    container, encoded = update_container(container, encoded)  # Always ensure container is of length 8 bits
+    writer.write(*elias_encode(len(name)))
 
     # Compress File Name Chars
     for char in name:
-        container.append(BitArray(ord(char), 8))
-        container, encoded = update_container(container, encoded)
+        writer.write(ord(char) & 0xFF, 8)
 
-    # Compress File Length
-    container.append(elias_encode(len(data)))
-    container, encoded = update_container(container, encoded)
+
+def encode_huffman(huffman_key, writer, canonical=False):
+    """
+    Encodes the Huffman encoding as the number of unique chars followed by each char and its code
+
+    :param huffman_key: Huffman encoding generated from char frequencies
+    :param writer: BitWriter to write Huffman encoding data to
+    :param canonical: Whether huffman_key is canonical and only its code lengths are stored
+    """
+    # Canonical codes are rebuilt from their lengths
+    if canonical:
+        encode_canonical(huffman_key, writer)
+        return
 
     # Obtain Huffman Encoding
-    huffman_key = huffman_encode(data)
     huffman_info = huffman_data(huffman_key)
 
     # Compress Number of Unique Chars
-    container.append(elias_encode(len(huffman_info)))
-    container, encoded = update_container(container, encoded)
+    writer.write(*elias_encode(len(huffman_info)))
 
     # Compress Huffman Encoding Data
     for char_index, encoding in huffman_info:
         # Char
-        container.append(BitArray(char_index, 8))
-        container, encoded = update_container(container, encoded)
+        writer.write(char_index, 8)
 
         # Length of Encoding
-        container.append(elias_encode(len(encoding)))
-        container, encoded = update_container(container, encoded)
+        writer.write(*elias_encode(len(encoding)))
 
         # Actual Encoding
-        container.append(encoding)
-        container, encoded = update_container(container, encoded)
+        writer.write(encoding.bits, encoding.length)
+
+
+def encode_canonical(huffman_key, writer):
+    """
+    Encodes a canonical Huffman encoding as the number of unique chars, the number of codes of every length up to the
+    longest one, and the chars in order of their codes
+
+    :param huffman_key: Canonical Huffman encoding
+    :param writer: BitWriter to write Huffman encoding data to
+    """
+    # Sort chars by code length then char (the order they were assigned codes in)
+    huffman_info = sorted(huffman_data(huffman_key), key=lambda info: (len(info[1]), info[0]))
+
+    # Compress Number of Unique Chars
+    writer.write(*elias_encode(len(huffman_info)))
+    if len(huffman_info) == 0:
+        return
+
+    # Compress Number of Codes of each Length
+    max_length = len(huffman_info[-1][1])
+    counts = [0] * (max_length + 1)
+    for _, encoding in huffman_info:
+        counts[len(encoding)] += 1
+    writer.write(*elias_encode(max_length))
+    for length in range(1, max_length + 1):
+        writer.write(*elias_encode(counts[length]))
+
+    # Compress Chars
+    for char_index, _ in huffman_info:
+        writer.write(char_index, 8)
+
+
+def cache_path(cache, block, window, lookahead, canonical=False, level=None):
+    """
+    Gets the file a compressed block is kept in in a chunk cache, named by a hash of the block contents and of every
+    setting the compressed block depends on
+
+    :param cache: Cache Directory
+    :param block: Block Contents
+    :param window: Window (or Dictionary) Size
+    :param lookahead: Lookahead Buffer Size
+    :param canonical: Whether canonical Huffman code lengths are stored instead of the codes
+    :param level: Compression Level
+    :return: Path of cached block
+    """
+    key = hashlib.sha256(repr((window, lookahead, canonical, level, isinstance(block, str))).encode())
+    key.update(block.encode("utf-8") if isinstance(block, str) else block)
+    return os.path.join(cache, "".join([key.hexdigest(), ".blk"]))
+
+
+def encode_block(block, window, lookahead, canonical=False, level=None, cache=None):
+    """
+    Encodes a block of text on its own (own Huffman Encoding, no references to other blocks) for the block container
+
+    :param block: Block Contents
+    :param window: Window (or Dictionary) Size
+    :param lookahead: Lookahead Buffer Size
+    :param canonical: Whether to store canonical Huffman code lengths instead of the codes
+    :param level: Compression Level (None for the longest match at every triple)
+    :param cache: Directory of already compressed blocks to reuse and add to (None for no cache)
+    :return: Compressed Block as bytearray (padded to whole bytes)
+    """
+    # Reuse the block if it has been compressed with the same settings before
+    if cache is not None:
+        path = cache_path(cache, block, window, lookahead, canonical, level)
+        if os.path.exists(path):
+            return bytearray(read_input(path, True))
+
+    # Important Variables
+    writer = BitWriter()
+
+    # Compress Block Length and Huffman Encoding
+    huffman_key = huffman_encode(block, canonical=canonical)
+    writer.write(*elias_encode(len(block)))
+    encode_huffman(huffman_key, writer, canonical)
+
+    # Compress Block Data Using LZ77
+    lz77_encode(block, window, lookahead, huffman_key, writer, level)
+    compressed = writer.getvalue()
+
+    # Add to cache (written under a temporary name first so other processes never read part of a block)
+    if cache is not None:
+        os.makedirs(cache, exist_ok=True)
+        temporary = "".join([path, ".", str(os.getpid())])
+        file = open(temporary, "wb")
+        file.write(compressed)
+        file.close()
+        os.replace(temporary, path)
+
+    # Done (remaining bits are padded)
+    return compressed
+
+
+def format_flags(canonical=False, binary=False):
+    """
+    Gets the format flags stored in the version byte
+
+    :param canonical: Whether canonical Huffman code lengths are stored instead of the codes
+    :param binary: Whether the file is bytes instead of UTF-8 text
+    :return: Format flags
+    """
+    flags = 0
+    if canonical:
+        flags |= lzformat.CANONICAL
+    if binary:
+        flags |= lzformat.BYTES
+    return flags
+
+
+def write_sizes(kind, window, lookahead, writer, canonical=False, binary=False):
+    """
+    Writes the versioned header of a format followed by the window and lookahead sizes
+
+    :param kind: Format (one of lzformat.STREAM, BLOCKS, INDEXED, ARCHIVE)
+    :param window: Window (or Dictionary) Size
+    :param lookahead: Lookahead Buffer Size
+    :param writer: BitWriter to write to
+    :param canonical: Whether canonical Huffman code lengths are stored instead of the codes
+    :param binary: Whether the file is bytes instead of UTF-8 text
+    """
+    writer.write_bytes(lzformat.header(kind, format_flags(canonical, binary)))
+    for size in (window, lookahead):
+        writer.write(*elias_encode(size))
+
+
+def count_lengths(items, lengths):
+    """
+    Passes items on while adding their lengths to a list
+
+    :param items: Iterable of items
+    :param lengths: List to add the length of every item to
+    :return: Generator of items
+    """
+    for item in items:
+        lengths.append(len(item))
+        yield item
+
+
+def parallel_map(function, items, workers=None, lengths=None):
+    """
+    Applies a function to every item in a pool of worker processes, giving the results in order as they are ready.
+    Items are handed to the workers as they are needed, so an iterable of blocks is never read into memory at once.
+
+    :param function: Function to apply (must be picklable)
+    :param items: Iterable of items
+    :param workers: Number of worker processes (Default to number of CPUs, 1 for no pool)
+    :param lengths: List to add the length of every item to as it is handed out (None to not count them)
+    :return: Generator of results (the workers are stopped once it is exhausted or closed)
+    """
+    # Count lengths while handing items to the workers
+    if lengths is not None:
+        items = count_lengths(items, lengths)
+
+    # Apply in this process or in a pool
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        yield from map(function, items)
+    else:
+        pool = multiprocessing.Pool(workers)
+        try:
+            yield from pool.imap(function, items)
+        finally:
+            pool.terminate()
+            pool.join()
+
+
+def main(name, data, window=None, lookahead=None, canonical=False, binary=False, level=None):
+    """
+    Encodes a file using the LZ77 encoding algorithm with Elias Omega Encoding and Huffman Encoding
+    for storing Integers and Characters.
+
+    :param name: File Name
+    :param data: File Contents (str, or bytes / mmap if binary)
+    :param window: Window (or Dictionary) Size (Default to that of the level)
+    :param lookahead: Lookahead Buffer Size (Default to that of the level)
+    :param canonical: Whether to store canonical Huffman code lengths instead of the codes (needs a versioned header)
+    :param binary: Whether data is bytes instead of text (needs a versioned header)
+    :param level: Compression Level from 1 (fastest) to 9 (smallest), None for the longest match at every triple
+    :return: Compressed Data as bytearray
+    """
+    # Important Variables
+    window, lookahead = level_sizes(level, window, lookahead)
+    writer = BitWriter()
+
+    # Flags are only in the versioned format
+    if canonical or binary:
+        write_sizes(lzformat.STREAM, window, lookahead, writer, canonical, binary)
+
+    # Compress File Name, File Length, and Huffman Encoding
+    huffman_key = huffman_encode(data, canonical=canonical)
+    encode_header(name, len(data), huffman_key, writer, canonical)
+
+    # Compress File Data Using LZ77
+    lz77_encode(data, window, lookahead, huffman_key, writer, level)
+
+    # Done (remaining bits are padded)
+    return writer.getvalue()
+
+
+def main_stream(name, window=None, lookahead=None, chunk_size=1 << 20, canonical=False, binary=False, level=None):
+    """
+    Streaming variant of main that compresses a file straight into <name>.bin. The file is read twice a chunk at a
+    time (once to count chars, once to encode) and compressed bytes are written as they are produced, so memory is
+    bounded by the window, lookahead, and chunk size instead of the file size. The window and lookahead sizes are
+    stored in the header so the decoder can bound its memory the same way.
+
+    :param name: File Name
+    :param window: Window (or Dictionary) Size (Default to that of the level)
+    :param lookahead: Lookahead Buffer Size (Default to that of the level)
+    :param chunk_size: Number of chars read at a time
+    :param canonical: Whether to store canonical Huffman code lengths instead of the codes
+    :param binary: Whether to read the file as bytes instead of UTF-8 text
+    :param level: Compression Level from 1 (fastest) to 9 (smallest), None for the longest match at every triple
+    """
+    # Count chars and file length
+    window, lookahead = level_sizes(level, window, lookahead)
+    counts = Counter()
+    data_length = 0
+    for chunk in read_chunks(name, chunk_size, binary):
+        counts.update(chunk)
+        data_length += len(chunk)
+
+    # Important Variables
+    output = open("".join([name, ".bin"]), "wb")
+    writer = BitWriter(output)
+
+    # Compress Window and Lookahead Sizes
+    write_sizes(lzformat.STREAM, window, lookahead, writer, canonical, binary)
+
+    # Compress File Name, File Length, and Huffman Encoding
+    huffman_key = huffman_encode(None, counts, canonical)
+    encode_header(name, data_length, huffman_key, writer, canonical)
 
     # Compress File Data Using LZ77
-    container, encoded = lz77_encode(data, window, lookahead, huffman_key, container, encoded)
+    lz77_encode_stream(read_chunks(name, chunk_size, binary), window, lookahead, huffman_key, writer, level)
+
+    # Pad remaining bits and flush
+    writer.flush()
+    output.close()
+
+
+def main_blocks(name, blocks, window=None, lookahead=None, workers=None, canonical=False, binary=False, level=None,
+                cache=None):
+    """
+    Block variant of main. Every block is compressed independently in a pool of worker processes, and a block index
+    (the compressed size of every block) is stored in the header so the decoder can split the blocks up the same way.
+
+    :param name: File Name
+    :param blocks: Iterable of strings (or bytes) making up the file contents, e.g. read_chunks(name, block_size)
+    :param window: Window (or Dictionary) Size (Default to that of the level)
+    :param lookahead: Lookahead Buffer Size (Default to that of the level)
+    :param workers: Number of worker processes (Default to number of CPUs)
+    :param canonical: Whether to store canonical Huffman code lengths instead of the codes
+    :param binary: Whether blocks are bytes instead of text
+    :param level: Compression Level from 1 (fastest) to 9 (smallest), None for the longest match at every triple
+    :param cache: Directory of already compressed blocks to reuse and add to (None for no cache)
+    :return: Compressed Data as bytearray
+    """
+    # Important Variables
+    window, lookahead = level_sizes(level, window, lookahead)
+    encode = functools.partial(encode_block, window=window, lookahead=lookahead, canonical=canonical, level=level,
+                               cache=cache)
+    lengths = []
+
+    # Compress Blocks (in order)
+    compressed = list(parallel_map(encode, blocks, workers, lengths))
+
+    # Important Variables
+    writer = BitWriter()
+
+    # Compress Window and Lookahead Sizes, File Name, and File Length
+    write_sizes(lzformat.BLOCKS, window, lookahead, writer, canonical, binary)
+    encode_name(name, writer)
+    writer.write(*elias_encode(sum(lengths)))
 
-    # Add remaining bits to encoded
-    if len(container) != 0:
-        container.extend(8 - (len(container) % 8))
-        encoded.append(container.to_bytes())
+    # Compress Block Index
+    writer.write(*elias_encode(len(compressed)))
+    for block in compressed:
+        writer.write(*elias_encode(len(block)))
+
+    # Add the blocks after the remaining bits are padded
+    for block in compressed:
+        writer.write_bytes(block)
 
     # Done
-    return encoded
+    return writer.getvalue()
+
+
+def main_indexed(name, blocks, window=None, lookahead=None, workers=None, canonical=False, binary=False, level=None,
+                 cache=None):
+    """
+    Indexed variant of main_blocks that compresses a file straight into <name>.bin. Blocks are written as soon as the
+    workers finish them, followed by an index of the compressed and original size of every block and, in the last 8
+    bytes, the offset of the index. A decoder can then find the blocks covering any part of the file from the end of
+    the file and decode only those (see myunzip.decompress_range).
+
+    :param name: File Name
+    :param blocks: Iterable of strings (or bytes) making up the file contents, e.g. read_chunks(name, block_size)
+    :param window: Window (or Dictionary) Size (Default to that of the level)
+    :param lookahead: Lookahead Buffer Size (Default to that of the level)
+    :param workers: Number of worker processes (Default to number of CPUs)
+    :param canonical: Whether to store canonical Huffman code lengths instead of the codes
+    :param binary: Whether blocks are bytes instead of text
+    :param level: Compression Level from 1 (fastest) to 9 (smallest), None for the longest match at every triple
+    :param cache: Directory of already compressed blocks to reuse and add to (None for no cache)
+    """
+    # Important Variables
+    window, lookahead = level_sizes(level, window, lookahead)
+    encode = functools.partial(encode_block, window=window, lookahead=lookahead, canonical=canonical, level=level,
+                               cache=cache)
+    lengths = []
+    sizes = []
+    output = open("".join([name, ".bin"]), "wb")
+    writer = BitWriter(output)
+
+    # Compress Window and Lookahead Sizes and File Name
+    write_sizes(lzformat.INDEXED, window, lookahead, writer, canonical, binary)
+    encode_name(name, writer)
+
+    # Compress Blocks and write them in order after the remaining bits are padded
+    for block in parallel_map(encode, blocks, workers, lengths):
+        writer.write_bytes(block)
+        sizes.append(len(block))
+
+    # Compress Block Index
+    writer.align()
+    index = len(writer) >> 3
+    writer.write(*elias_encode(len(sizes)))
+    for size, length in zip(sizes, lengths):
+        writer.write(*elias_encode(size))
+        writer.write(*elias_encode(length))
+
+    # Offset of the Block Index
+    writer.write_bytes(index.to_bytes(8, "big"))
+
+    # Pad remaining bits and flush
+    writer.flush()
+    output.close()
+
+
+def list_files(directory):
+    """
+    Lists the files under a directory, named by their path from the parent of the directory with / separators
+
+    :param directory: Directory
+    :return: List of (path, name) in sorted order
+    """
+    files = []
+    parent = os.path.dirname(os.path.abspath(directory))
+    for root, dirs, names in os.walk(directory):
+        dirs.sort()
+        for file_name in sorted(names):
+            path = os.path.join(root, file_name)
+            files.append((path, os.path.relpath(os.path.abspath(path), parent).replace(os.sep, "/")))
+    return files
+
+
+def count_file(path):
+    """
+    Counts the bytes of a file, for training the Huffman encoding shared by an archive
+
+    :param path: Path of file
+    :return: Counter of bytes
+    """
+    return Counter(memoryview(read_input(path, True)))
+
+
+def encode_entry(path, window, lookahead, huffman_key, level=None):
+    """
+    Encodes a file as an entry of an archive: its length followed by its LZ77 encoded bytes, with chars stored using
+    the Huffman encoding shared by the archive
+
+    :param path: Path of file
+    :param window: Window (or Dictionary) Size
+    :param lookahead: Lookahead Buffer Size
+    :param huffman_key: Shared Huffman encoding
+    :param level: Compression Level (None for the longest match at every triple)
+    :return: Compressed Entry as bytearray (padded to whole bytes)
+    """
+    data = read_input(path, True)
+    writer = BitWriter()
+    writer.write(*elias_encode(len(data)))
+    lz77_encode(data, window, lookahead, huffman_key, writer, level)
+    return writer.getvalue()
+
+
+def main_archive(directory, window=None, lookahead=None, workers=None, canonical=False, level=None):
+    """
+    Compresses every file under a directory into a single archive <directory>.bin. A Huffman encoding is trained on
+    the bytes of all files and stored once, then every file is compressed on its own as an entry by a pool of worker
+    processes. A central directory of the name, compressed size, and length of every entry follows the entries and its
+    offset is stored in the last 8 bytes, so a decoder can list the archive or extract one entry without reading the
+    others (see myunzip.list_archive and myunzip.extract_entry).
+
+    :param directory: Directory to compress
+    :param window: Window (or Dictionary) Size (Default to that of the level)
+    :param lookahead: Lookahead Buffer Size (Default to that of the level)
+    :param workers: Number of worker processes (Default to number of CPUs)
+    :param canonical: Whether to store canonical Huffman code lengths instead of the codes
+    :param level: Compression Level from 1 (fastest) to 9 (smallest), None for the longest match at every triple
+    """
+    # Important Variables
+    window, lookahead = level_sizes(level, window, lookahead)
+    files = list_files(directory)
+    paths = [path for path, _ in files]
+
+    # Train the shared Huffman Encoding on every file
+    counts = Counter()
+    for file_counts in parallel_map(count_file, paths, workers):
+        counts.update(file_counts)
+    huffman_key = huffman_encode(None, counts, canonical)
+
+    # Important Variables
+    output = open("".join([directory.rstrip("/" + os.sep), ".bin"]), "wb")
+    writer = BitWriter(output)
+
+    # Compress Window and Lookahead Sizes and Shared Huffman Encoding
+    write_sizes(lzformat.ARCHIVE, window, lookahead, writer, canonical, True)
+    encode_huffman(huffman_key, writer, canonical)
+
+    # Compress Entries and write them in order after the remaining bits are padded
+    sizes = []
+    encode = functools.partial(encode_entry, window=window, lookahead=lookahead, huffman_key=huffman_key, level=level)
+    for entry in parallel_map(encode, paths, workers):
+        writer.write_bytes(entry)
+        sizes.append(len(entry))
+
+    # Compress Central Directory (names are stored as their UTF-8 bytes)
+    writer.align()
+    directory_offset = len(writer) >> 3
+    writer.write(*elias_encode(len(files)))
+    for (path, name), size in zip(files, sizes):
+        encode_name(name.encode("utf-8").decode("latin-1"), writer)
+        writer.write(*elias_encode(size))
+        writer.write(*elias_encode(os.path.getsize(path)))
+
+    # Offset of the Central Directory
+    writer.write_bytes(directory_offset.to_bytes(8, "big"))
+
+    # Pad remaining bits and flush
+    writer.flush()
+    output.close()
 
 
 if __name__ == "__main__":
     # Read Inputs
-    file_name, W, L = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
-    file_data = read_input(file_name)
+    parser = argparse.ArgumentParser(description="Encodes a text file (or a directory into an archive) using LZ77.")
+    parser.add_argument("file_name", help="File or directory to encode, written to <file_name>.bin")
+    parser.add_argument("window", type=int, nargs="?", help="Window (or Dictionary) Size (Default to that of --level)")
+    parser.add_argument("lookahead", type=int, nargs="?", help="Lookahead Buffer Size (Default to that of --level)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Read and write the file in chunks, keeping only the window and lookahead in memory")
+    parser.add_argument("--chunk-size", type=int, help="Chars read at a time with --stream (Default to 1 MiB)")
+    parser.add_argument("--block-size", type=int,
+                        help="Split the file into independent blocks of this many chars, compressed in parallel")
+    parser.add_argument("--workers", type=int, help="Worker processes with --block-size (Default to number of CPUs)")
+    parser.add_argument("--indexed", action="store_true",
+                        help="Write blocks (of --block-size, default 1 MiB) followed by an index so ranges of the file "
+                             "can be decoded on their own")
+    parser.add_argument("--cdc", action="store_true",
+                        help="Cut blocks where a rolling hash of the contents says so, so unchanged parts of a file "
+                             "give the same blocks (--block-size is then the average size, default 64 KiB)")
+    parser.add_argument("--cache", metavar="DIR",
+                        help="Reuse blocks compressed before from this directory, adding new ones to it")
+    parser.add_argument("--canonical", action="store_true",
+                        help="Store only canonical Huffman code lengths (smaller header, versioned format)")
+    parser.add_argument("--bytes", action="store_true",
+                        help="Compress any file as raw bytes instead of UTF-8 text (memory mapped, versioned format)")
+    parser.add_argument("--level", type=int, choices=sorted(LEVELS),
+                        help="Compression level from 1 (fastest) to 9 (smallest), also sets the default sizes")
+    parser.add_argument("--stats", action="store_true", help="Print the time spent in each stage")
+    args = parser.parse_args()
+    lzstats.enabled = args.stats
+    start_time = lzstats.clock()
+    if args.level is None and args.lookahead is None:
+        parser.error("window and lookahead are required without --level")
+    blocked = args.indexed or args.block_size or args.cdc
+    archive = os.path.isdir(args.file_name)
+    if archive and (args.stream or args.bytes or blocked or args.chunk_size or args.cache):
+        parser.error("a directory is always compressed as bytes into an archive, so --stream, --chunk-size, --bytes, "
+                     "--block-size, --indexed, --cdc and --cache cannot be used with it")
+    if args.stream and blocked:
+        parser.error("--stream cannot be used with --block-size, --indexed or --cdc")
+    if args.chunk_size and not args.stream:
+        parser.error("--chunk-size needs --stream")
+    if args.cache and not blocked:
+        parser.error("--cache needs --block-size, --indexed or --cdc")
+    if args.workers and not (blocked or archive):
+        parser.error("--workers needs --block-size, --indexed, --cdc or a directory")
 
     # Compress and Write
-    encoded_data = main(file_name, file_data, W, L)
-    write_output(file_name, encoded_data)
+    if archive:
+        main_archive(args.file_name, args.window, args.lookahead, args.workers, args.canonical, args.level)
+    elif args.stream:
+        main_stream(args.file_name, args.window, args.lookahead, args.chunk_size or 1 << 20, args.canonical, args.bytes,
+                    args.level)
+    elif blocked:
+        # Split into blocks
+        if args.cdc:
+            file_blocks = cdc_chunks(read_chunks(args.file_name, 1 << 20, args.bytes), args.block_size or 1 << 16)
+        else:
+            file_blocks = read_chunks(args.file_name, args.block_size or 1 << 20, args.bytes)
+
+        # Compress Blocks
+        if args.indexed:
+            main_indexed(args.file_name, file_blocks, args.window, args.lookahead, args.workers, args.canonical,
+                         args.bytes, args.level, args.cache)
+        else:
+            encoded_data = main_blocks(args.file_name, file_blocks, args.window, args.lookahead, args.workers,
+                                       args.canonical, args.bytes, args.level, args.cache)
+            write_output(args.file_name, encoded_data)
+    else:
+        file_data = read_input(args.file_name, args.bytes)
+        encoded_data = main(args.file_name, file_data, args.window, args.lookahead, args.canonical, args.bytes,
+                            args.level)
+        write_output(args.file_name, encoded_data)
+
+    # Print Stage Timing
+    if args.stats:
+        lzstats.report(lzstats.clock() - start_time)
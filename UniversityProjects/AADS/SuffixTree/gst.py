@@ -1,79 +1,440 @@
 """
-Uses a Generalised Suffix Tree constructed with Ukkonen's Algorithm to perform case insensitive pattern matching
-given a query txt file of texts and patterns.
+Uses a Generalised Suffix Tree constructed with Ukkonen's Algorithm over case folded texts to perform case insensitive
+pattern matching given a query txt file of texts and patterns. The tree can also be saved to an index file once and
+memory mapped to answer patterns later without building it again.
 """
 
 __author__ = "Arthur Lee"
 
 import sys
+import json
+import mmap
+import heapq
+import argparse
+import threading
+from array import array
+from collections import Counter
 
+from suffixarray import GeneralisedSuffixArray, fold, typecode
 
-class Node:
+ROOT = 0    # Node ID of root
+NONE = -1   # Node ID meaning no node
+DIVERSE = -2    # Left char of a node whose occurrences are not all preceded by the same char
+
+INDEX_MAGIC = b"GSTI"
+INDEX_VERSION = 6
+
+TOP_DOCUMENTS = 8   # Default number of most frequent documents kept at each node for documents()
+COMPACT_THRESHOLD = 0.25    # Fraction of chars in removed texts at which the GST is rebuilt without them
+
+OUTPUT_BUFFER = 1 << 20     # Size of buffer of output file in bytes
+OUTPUT_BATCH = 4096     # Number of matches written to output file at a time
+
+
+class NodeStore:
     """
-    Node in Suffix Tree. Compressed representation: Store as [string_id, start, end] where string_id is index of string
-    in strings array; start and end are indices in string.
+    Nodes of a Suffix Tree stored as parallel arrays indexed by Node ID instead of as objects. Compressed
+    representation: Store as [string_id, start, end] where string_id is index of string in strings array; start and end
+    are indices in string. Chars are dense Char IDs (see GeneralisedSuffixTree.encode), so a node's size does not depend
+    on the alphabet. Children are stored in linked lists of siblings sorted by the first char on their edge, which
+    are walked for lookups (except for the root, whose children are also kept in a dict as it has the most of them).
+    Suffix IDs of leaves are stored in linked lists of (text_id, suffix_id) entries. A node takes about 40 bytes.
+
+    Once the tree is built, every node is annotated with the number of Suffix IDs below it, the number of texts they are
+    in, and the texts they are most often in (a list of (text_id, count) entries of up to top_documents per node).
     """
-    def __init__(self, string_id=None, start=None, end=None, suffix_link=None, is_root=False, is_leaf=False):
+    # Names of arrays, in the order they are saved
+    ARRAYS = ("string_id", "start", "end", "suffix_link", "is_leaf", "char", "first_child", "next_sibling",
+              "first_suffix", "suffix_text", "suffix_index", "next_suffix", "leaf_count", "doc_count", "top_start",
+              "top_text", "top_count")
+
+    def __init__(self, arrays=None):
         """
-        Constructor
+        Constructor. Creates the root, or uses the arrays of a saved tree.
+
+        :param arrays: Dict of array name -> array (or memoryview of a memory mapped index) of an existing tree
+        """
+        # Nodes
+        self.string_id = array("i")
+        self.start = array("i")
+        self.end = array("i")
+        self.suffix_link = array("i")   # Link to next Suffix for Ukkonen
+        self.is_leaf = array("b")
+
+        # Children
+        self.root_children = {}     # Char ID -> child of root
+        self.char = array("i")      # Char ID of first char on edge into node
+        self.first_child = array("i")
+        self.next_sibling = array("i")
+
+        # Suffix IDs (last one added to each leaf is first in its list)
+        self.first_suffix = array("i")
+        self.suffix_text = array("i")
+        self.suffix_index = array("i")
+        self.next_suffix = array("i")
+
+        # Annotations (filled in once the tree is built)
+        self.leaf_count = array("i")    # Number of Suffix IDs below node
+        self.doc_count = array("i")     # Number of texts with a Suffix ID below node
+        self.top_start = array("i")     # Start of list of most frequent texts below node
+        self.top_text = array("i")
+        self.top_count = array("i")
+
+        # Existing Tree: Use its arrays and find the children of the root
+        if arrays is not None:
+            for name in self.ARRAYS:
+                setattr(self, name, arrays[name])
+            child = self.first_child[ROOT]
+            while child != NONE:
+                self.root_children[self.char[child]] = child
+                child = self.next_sibling[child]
+
+        # New Tree: Root
+        else:
+            self.add()
+
+    def __len__(self):
+        """
+        Get the number of nodes
+
+        :return: Number of nodes
+        """
+        return len(self.start)
+
+    def add(self, string_id=NONE, start=NONE, end=NONE, is_leaf=False):
+        """
+        Adds a node with no children
 
         :param string_id: Index of string in strings array
         :param start: Start Index
         :param end: End Index
-        :param suffix_link: Link to next Suffix for Ukkonen
-        :param is_root: True if root, False otherwise
         :param is_leaf: True if leaf, False otherwise
+        :return: Node ID of new node
         """
-        self.link = [None] * 128  # First 128 ASCII Chars
-        self.string_id = string_id
-        self.start = start
-        self.end = end
-        self.suffix_link = suffix_link
-        self.is_root = is_root
-        self.is_leaf = is_leaf
-        self.suffix_id = []  # We store Suffix IDs as array of (text_id, suffix_id) tuples
+        self.string_id.append(string_id)
+        self.start.append(start)
+        self.end.append(end)
+        self.suffix_link.append(NONE)
+        self.is_leaf.append(is_leaf)
+        self.char.append(NONE)
+        self.first_child.append(NONE)
+        self.next_sibling.append(NONE)
+        self.first_suffix.append(NONE)
+        return len(self.start) - 1
+
+    def child(self, node, char):
+        """
+        Gets the child of a node whose edge starts with a char
+
+        :param node: Node ID
+        :param char: Char ID
+        :return: Node ID of child, NONE if there is no such child
+        """
+        if node == ROOT:
+            return self.root_children.get(char, NONE)
+
+        # Siblings are sorted, so stop at the first char that is not smaller
+        current = self.first_child[node]
+        while current != NONE and self.char[current] < char:
+            current = self.next_sibling[current]
+        if current != NONE and self.char[current] == char:
+            return current
+        return NONE
+
+    def set_child(self, node, char, child):
+        """
+        Sets the child of a node whose edge starts with a char, replacing the existing child if there is one
+
+        :param node: Node ID
+        :param char: Char ID
+        :param child: Node ID of child
+        """
+        # Find where the child goes in the sorted list of siblings
+        previous = NONE
+        current = self.first_child[node]
+        while current != NONE and self.char[current] < char:
+            previous = current
+            current = self.next_sibling[current]
+
+        # Replace the existing child or insert before the next one
+        if current != NONE and self.char[current] == char:
+            self.next_sibling[child] = self.next_sibling[current]
+        else:
+            self.next_sibling[child] = current
+        if previous == NONE:
+            self.first_child[node] = child
+        else:
+            self.next_sibling[previous] = child
+
+        # Done
+        self.char[child] = char
+        if node == ROOT:
+            self.root_children[char] = child
+
+    def add_suffix(self, leaf, text_id, suffix_id):
+        """
+        Stores a Suffix ID in a leaf
+
+        :param leaf: Node ID of leaf
+        :param text_id: Index of text
+        :param suffix_id: Index of suffix in text
+        """
+        self.suffix_text.append(text_id)
+        self.suffix_index.append(suffix_id)
+        self.next_suffix.append(self.first_suffix[leaf])
+        self.first_suffix[leaf] = len(self.suffix_text) - 1
+
+    def suffix_ids(self, leaf):
+        """
+        Gets the Suffix IDs stored in a leaf in the order they were added
+
+        :param leaf: Node ID of leaf
+        :return: List of (text_id, suffix_id) tuples
+        """
+        suffix_ids = []
+        current = self.first_suffix[leaf]
+        while current != NONE:
+            suffix_ids.append((self.suffix_text[current], self.suffix_index[current]))
+            current = self.next_suffix[current]
+        suffix_ids.reverse()
+        return suffix_ids
 
 
 class GeneralisedSuffixTree:
     """
     Implementation of a Generalised Suffix Tree (GST) with a catch: the Suffix IDs of blank string suffixes (i.e. sole
-    "$" strings are not stored in node.suffix_id)
+    "$" strings are not stored in the leaves)
     """
-    def __init__(self, strings):
+    def __init__(self, strings, removed=(), top_documents=TOP_DOCUMENTS):
         """
-        Constructor. Uses Ukkonen's Algorithm to store multiple strings (terminated with $) into a GST.
-
-        :param strings: List of strings terminated with $
+        Constructor. Uses Ukkonen's Algorithm to store multiple strings (terminated with $) into a GST. The strings are
+        case folded first (without moving any char) so case insensitive matching only has one path to follow, then
+        the chars in them are given dense Char IDs in order (the terminal $ of every string is Char ID 0, which no
+        other char can match).
+
+        :param strings: List of strings (or bytes) terminated with $
+        :param removed: Indices of removed strings (not stored in the tree, and not in results)
+        :param top_documents: Number of most frequent texts kept at every node for documents()
         """
-        self.root = Node(is_root=True)
+        # Char IDs of every char in the strings
+        strings = [fold(string) for string in strings]
+        self.binary = len(strings) > 0 and not isinstance(strings[0], str)
+        self.chars = [b"$"[0] if self.binary else "$"]  # Char ID -> char
+        self.alphabet = {}  # Char -> Char ID
+        for char in sorted(set().union(*(set(string[:-1]) for string in strings))):
+            self.alphabet[char] = len(self.chars)
+            self.chars.append(char)
+        self.codes = [self.encode(string[:-1]) for string in strings]   # Strings as arrays of Char IDs
+
+        # Build Tree
+        self.top_documents = top_documents
+        self.removed = set(removed)
+        self.lock = threading.RLock()   # Held while the tree is used or changed
+        self.compaction = None  # Thread rebuilding the tree without removed strings, if any
+        self.nodes = NodeStore()
         for i in range(len(strings)):
-            self.ukkonen(strings, i)
+            if i not in self.removed:
+                self.ukkonen(self.codes, i)
+        self.annotate()
 
-    @staticmethod
-    def index(char):
+    def encode(self, text):
         """
-        Converts ASCII char to appropriate index in this special Suffix Tree
+        Converts a case folded text to an array of Char IDs ending with the terminal. Chars not yet in the alphabet are
+        given the next Char IDs (so they come after the others in the order of the tree until it is compacted). Arrays
+        use the smallest type that fits the largest Char ID.
 
-        :param char: ASCII character
-        :return: Appropriate Index
+        :param text: Case folded text (without terminal $)
+        :return: Array of Char IDs
         """
-        # Shift chars before $ by 1
-        if 0 <= ord(char) <= 35:
-            return ord(char) + 1
+        for char in sorted(set(text) - self.alphabet.keys()):
+            self.alphabet[char] = len(self.chars)
+            self.chars.append(char)
+        codes = array(typecode(len(self.chars) - 1), map(self.alphabet.__getitem__, text))
+        codes.append(0)
+        return codes
+
+    def text(self, text_id):
+        """
+        Converts the Char IDs of a text back to chars
 
-        # Set $ to 0
-        elif ord(char) == 36:
-            return 0
+        :param text_id: Index of text
+        :return: Case folded text (without terminal $)
+        """
+        return self.decode(self.codes[text_id][:-1])
 
-        # Every other char is unchanged
-        else:
-            return ord(char)
+    def decode(self, codes):
+        """
+        Converts Char IDs back to chars
+
+        :param codes: Char IDs (not including the terminal)
+        :return: Case folded string (or bytes)
+        """
+        chars = [self.chars[code] for code in codes]
+        return bytes(chars) if self.binary else "".join(chars)
+
+    def check_type(self, text):
+        """
+        Checks a text or pattern is the same type as the texts in the GST, as chars of strings never match bytes
+
+        :param text: Text or pattern
+        :raises TypeError: If it is bytes in a GST of strings or a string in a GST of bytes
+        """
+        if isinstance(text, str) == self.binary:
+            raise TypeError("".join(["GST holds ", "bytes" if self.binary else "strings", ", not ",
+                                     type(text).__name__]))
+
+    def add_document(self, text):
+        """
+        Adds a text to the GST. Ukkonen's Algorithm inserts one string at a time anyway, so this is the same as if the
+        text was in the strings the GST was built with. The annotations used by count and documents are computed again
+        the next time they are needed.
+
+        :param text: Text (without terminal $)
+        :return: Index of text
+        """
+        if not isinstance(self.nodes.start, array):
+            raise ValueError("A GST loaded from an index file cannot be changed")
+        with self.lock:
+            # The first text sets whether the GST holds strings or bytes
+            if len(self.codes) == 0:
+                self.binary = not isinstance(text, str)
+                self.chars[0] = b"$"[0] if self.binary else "$"
+            self.check_type(text)
+            self.codes.append(self.encode(fold(text)))
+            self.ukkonen(self.codes, len(self.codes) - 1)
+            self.annotated = False
+            return len(self.codes) - 1
+
+    def remove_document(self, text_id):
+        """
+        Removes a text from the GST. The text is only marked as removed (a tombstone) and its Suffix IDs are left out of
+        results. Once the removed texts make up more than COMPACT_THRESHOLD of the chars in the GST, it is rebuilt
+        without them in a background thread. Indices of other texts do not change.
+
+        :param text_id: Index of text
+        """
+        with self.lock:
+            if not 0 <= text_id < len(self.codes):
+                raise IndexError("No text " + str(text_id))
+            self.removed.add(text_id)
+            self.annotated = False
+
+            # Compact when enough chars are in removed texts (texts removed by compaction are blank)
+            removed_chars = sum(len(self.codes[i]) - 1 for i in self.removed)
+            if self.compaction is None and \
+                    removed_chars > COMPACT_THRESHOLD * sum(len(codes) - 1 for codes in self.codes):
+                self.compaction = threading.Thread(target=self.compact, daemon=True)
+                self.compaction.start()
+
+    def compact(self):
+        """
+        Rebuilds the GST without the removed texts, which also gives dense Char IDs in order again. Pattern matching and
+        changes can go on while the new GST is built; texts added meanwhile are inserted into it before it replaces the
+        old one.
+        """
+        # Texts to rebuild from (removed texts are left blank)
+        with self.lock:
+            count = len(self.codes)
+            removed = set(self.removed)
+            blank = b"" if self.binary else ""
+            strings = [terminate(blank if i in removed else self.text(i)) for i in range(count)]
+
+        # Build without the lock
+        tree = GeneralisedSuffixTree(strings, removed=removed, top_documents=self.top_documents)
+
+        # Catch up and replace
+        with self.lock:
+            for i in range(count, len(self.codes)):
+                tree.add_document(self.text(i))
+            self.nodes, self.codes, self.chars, self.alphabet = tree.nodes, tree.codes, tree.chars, tree.alphabet
+            self.annotated = len(self.codes) == count and self.removed == removed
+            if self.compaction is threading.current_thread():
+                self.compaction = None
+
+    def save(self, filename):
+        """
+        Saves the tree to an index file: a header of the file layout and the alphabet in JSON followed by the Char IDs
+        of every text and every array of the NodeStore as they are in memory, each starting at a multiple of 8 bytes
+        so they can be memory mapped. The annotations are computed again first if texts were added or removed since.
+
+        :param filename: Name of index file
+        """
+        with self.lock:
+            # Annotations must match the texts
+            if not self.annotated:
+                self.annotate()
+
+            # Important Variables
+            arrays = [("codes." + str(i), self.codes[i]) for i in range(len(self.codes))] + \
+                     [(name, getattr(self.nodes, name)) for name in NodeStore.ARRAYS]
+
+            # Layout: offset of every array (counted from the end of the header)
+            layout = {"byteorder": sys.byteorder, "texts": len(self.codes), "binary": self.binary,
+                      "chars": self.chars[1:], "removed": sorted(self.removed),
+                      "top_documents": self.top_documents, "arrays": []}
+            offset = 0
+            for name, values in arrays:
+                itemsize = memoryview(values).itemsize
+                layout["arrays"].append([name, memoryview(values).format, offset, len(values)])
+                offset += -(-len(values) * itemsize // 8) * 8
+            header = json.dumps(layout).encode("utf-8")
+            header += b" " * (-(len(INDEX_MAGIC) + 5 + len(header)) % 8)
+
+            # Write Index File
+            with open(filename, "wb") as file:
+                file.write(INDEX_MAGIC + bytes([INDEX_VERSION]) + len(header).to_bytes(4, "little") + header)
+                for name, values in arrays:
+                    data = memoryview(values).cast("B")
+                    file.write(data)
+                    file.write(bytes(-len(data) % 8))
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Loads a tree saved to an index file. The file is memory mapped and the arrays are used as they are in the file,
+        so nothing but the header is read (the OS reads the rest of the tree as it is used).
+
+        :param filename: Name of index file
+        :return: GeneralisedSuffixTree (read only until it is compacted)
+        """
+        # Map File
+        with open(filename, "rb") as file:
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapping)
+
+        # Read Header
+        if bytes(view[:len(INDEX_MAGIC)]) != INDEX_MAGIC or view[len(INDEX_MAGIC)] != INDEX_VERSION:
+            raise ValueError(filename + " is not a GST index file")
+        header_length = int.from_bytes(view[len(INDEX_MAGIC) + 1:len(INDEX_MAGIC) + 5], "little")
+        start = len(INDEX_MAGIC) + 5 + header_length
+        layout = json.loads(bytes(view[len(INDEX_MAGIC) + 5:start]).decode("utf-8"))
+        if layout["byteorder"] != sys.byteorder:
+            raise ValueError(filename + " was saved on a machine with a different byte order")
+
+        # Get Arrays without copying them
+        arrays = {}
+        for name, typecode, offset, length in layout["arrays"]:
+            itemsize = array(typecode).itemsize
+            arrays[name] = view[start + offset:start + offset + length * itemsize].cast(typecode)
+
+        # Replace the arrays of an empty tree
+        tree = cls([])
+        tree.binary = layout["binary"]
+        tree.chars = [b"$"[0] if tree.binary else "$"] + layout["chars"]
+        tree.alphabet = {tree.chars[i]: i for i in range(1, len(tree.chars))}
+        tree.codes = [arrays["codes." + str(i)] for i in range(layout["texts"])]
+        tree.nodes = NodeStore(arrays)
+        tree.removed = set(layout["removed"])
+        tree.top_documents = layout["top_documents"]
+
+        # Done
+        return tree
 
     def ukkonen(self, strings, string_id):
         """
         Ukkonen's Algorithm modified to account for inserting into a GST
 
-        :param strings: List of strings terminated with $
+        :param strings: List of arrays of Char IDs ending with the terminal
         :param string_id: Index of string in strings
         """
         # Counters
@@ -81,8 +442,8 @@ class GeneralisedSuffixTree:
         j = 0
 
         # Active Point and Previous Node (for Suffix Link)
-        previous_node = None
-        active_node = self.root
+        previous_node = NONE
+        active_node = ROOT
         active_edge = 0     # Represented as an index for a char in string
         active_length = 0   # From Active Node
 
@@ -90,7 +451,7 @@ class GeneralisedSuffixTree:
         while i < len(strings[string_id]):
 
             """
-            We do not need a Global End as we immediately set node.end = len(string) - 1 if the node is a leaf. 
+            We do not need a Global End as we immediately set end = len(string) - 1 if the node is a leaf. 
             Therefore, Rule 1 and Once a Leaf Always a Leaf has already been taken care of.
             """
 
@@ -119,341 +480,582 @@ class GeneralisedSuffixTree:
         :param active_node: Active Node
         :param active_edge: Active Edge
         :param active_length: Active Length
-        :param strings: List of strings terminated with $
+        :param strings: List of arrays of Char IDs ending with the terminal
         :param string_id: Index of string in strings
         :param start: Current Extension (j-index)
         :param end: Current Phase (i-index)
         :return: Recently created internal node (if any), AN, AE, AL, Bool representing if Rule 3 executed
         """
-        # Check if active node is root
-        if active_node.is_root:
-            # Rule 2a: Node completely traversed but no branch present, add branch and end
-            if active_node.link[self.index(strings[string_id][start])] is None:
+        # Important Variables
+        nodes = self.nodes
+        string = strings[string_id]
+
+        # Skip-Count Traversal moves the Active Node down until the Active Length is within a single edge
+        while True:
+            # Check if active node is root
+            if active_node == ROOT:
+                # Rule 2a: Node completely traversed but no branch present, add branch and end
+                if nodes.child(active_node, string[start]) == NONE:
 
-                # Create Leaf node
-                active_node.link[self.index(strings[string_id][start])] = \
-                    Node(string_id=string_id, start=start, end=len(strings[string_id]) - 1, is_leaf=True)
+                    # Create Leaf node
+                    leaf = nodes.add(string_id=string_id, start=start, end=len(string) - 1, is_leaf=True)
+                    nodes.set_child(active_node, string[start], leaf)
 
-                # Only store Suffix ID if leaf is not blank string
-                if self.index(strings[string_id][start]) != 0:
-                    active_node.link[self.index(strings[string_id][start])].suffix_id.append((string_id, start))
+                    # Only store Suffix ID if leaf is not blank string
+                    if string[start] != 0:
+                        nodes.add_suffix(leaf, string_id, start)
 
-                # No Internal Node Created, AN/AE maintained, AL is still 0, Not Showstopper
-                return None, active_node, active_edge, 0, False
+                    # No Internal Node Created, AN/AE maintained, AL is still 0, Not Showstopper
+                    return NONE, active_node, active_edge, 0, False
 
-            # Branch Exists, set Active Edge to branch
+                # Branch Exists, set Active Edge to branch
+                else:
+                    active_edge = start
             else:
-                active_edge = start
-        else:
-            # Rule 2a: Node completely traversed but no branch present, add branch and end
-            if active_node.link[self.index(strings[string_id][active_edge])] is None:
+                # Rule 2a: Node completely traversed but no branch present, add branch and end
+                if nodes.child(active_node, string[active_edge]) == NONE:
 
-                # Create Leaf Node
-                active_node.link[self.index(strings[string_id][active_edge])] = \
-                    Node(string_id=string_id, start=active_edge, end=len(strings[string_id]) - 1, is_leaf=True)
+                    # Create Leaf Node
+                    leaf = nodes.add(string_id=string_id, start=active_edge, end=len(string) - 1, is_leaf=True)
+                    nodes.set_child(active_node, string[active_edge], leaf)
 
-                # Store Suffix ID
-                active_node.link[self.index(strings[string_id][active_edge])].suffix_id.append((string_id, start))
+                    # Store Suffix ID
+                    nodes.add_suffix(leaf, string_id, start)
 
-                if active_node.suffix_link.is_root:
-                    # No Internal Node Created, Traverse SL for AN, AE maintained, AL is i-j-1, Not Showstopper
-                    return None, active_node.suffix_link, active_edge, end - start - 1, False
-                else:
-                    # No Internal Node Created, Traverse SL for AN, AE maintained, AL is 0, Not Showstopper
-                    return None, active_node.suffix_link, active_edge, 0, False
+                    if nodes.suffix_link[active_node] == ROOT:
+                        # No Internal Node Created, Traverse SL for AN, AE maintained, AL is i-j-1, Not Showstopper
+                        return NONE, nodes.suffix_link[active_node], active_edge, end - start - 1, False
+                    else:
+                        # No Internal Node Created, Traverse SL for AN, AE maintained, AL is 0, Not Showstopper
+                        return NONE, nodes.suffix_link[active_node], active_edge, 0, False
 
-        # Important Variables
-        child = active_node.link[self.index(strings[string_id][active_edge])]
-        string_index = end
-        node_index = child.start + active_length
-        node_length = child.end - child.start + 1
-
-        # Skip-Count Traverse: If active length longer than node length, traverse to next node
-        if active_length >= node_length:
-            # Previous Node, Start, End maintained; Increase AE by Node Length; Current Node Length is shaved from AL
-            return self.traverse(previous_node, child, active_edge + node_length, active_length - node_length,
-                                 strings, string_id, start, end)
-
-        # Rule 2b: Node not completely traversed and no branch present, branch out and end
-        if strings[string_id][string_index] != strings[child.string_id][node_index]:
-
-            # Replace child of current with first half of child
-            active_node.link[self.index(strings[string_id][active_edge])] = \
-                Node(string_id=child.string_id, start=child.start, end=node_index-1)
-
-            # Update child start to new value and set new child as parent of old child
-            child.start = node_index
-            active_node.link[self.index(strings[string_id][active_edge])].link[
-                self.index(strings[child.string_id][node_index])] = child
-
-            # Create new node
-            active_node.link[self.index(strings[string_id][active_edge])].link[
-                self.index(strings[string_id][string_index])] = \
-                Node(string_id=string_id, start=string_index, end=len(strings[string_id]) - 1, is_leaf=True)
-
-            # Store Suffix ID
-            active_node.link[self.index(strings[string_id][active_edge])].link[
-                self.index(strings[string_id][string_index])].suffix_id.append((string_id, start))
-
-            # Reset Child and Update Suffix Links
-            child = active_node.link[self.index(strings[string_id][active_edge])]
-            if previous_node is not None:
-                previous_node.suffix_link = child
-            child.suffix_link = self.root
-
-            if active_node.is_root:
-                # Internal Node Created, AN/AE maintained, AL is i-j-1, Not Showstopper
-                return child, active_node, active_edge, end - start - 1, False
-            else:
-                if active_node.suffix_link.is_root:
-                    # Internal Node Created, Traverse SL for AN, AE maintained, AL is i-j-1, Not Showstopper
-                    return child, active_node.suffix_link, active_edge, end - start - 1, False
-                else:
-                    # Internal Node Created, Traverse SL for AN, AE/AL maintained, Not Showstopper
-                    return child, active_node.suffix_link, active_edge, active_length, False
+            # Important Variables
+            child = nodes.child(active_node, string[active_edge])
+            child_string = strings[nodes.string_id[child]]
+            string_index = end
+            node_index = nodes.start[child] + active_length
+            node_length = nodes.end[child] - nodes.start[child] + 1
 
-        # String completely traversed not ending at leaf
-        else:
-            # Special Rule: String completely traversed, next node is leaf
-            if child.is_leaf and active_length == node_length - 1:
+            # Skip-Count Traverse: If active length longer than node length, traverse to next node
+            if active_length >= node_length:
+                # Previous Node, Start, End maintained; Increase AE by Node Length; Node Length is shaved from AL
+                active_node, active_edge, active_length = child, active_edge + node_length, active_length - node_length
+                continue
+
+            # Rule 2b: Node not completely traversed and no branch present, branch out and end
+            if string[string_index] != child_string[node_index]:
+
+                # Replace child of current with first half of child
+                middle = nodes.add(string_id=nodes.string_id[child], start=nodes.start[child], end=node_index - 1)
+                nodes.set_child(active_node, string[active_edge], middle)
 
-                # Store Suffix ID only if leaf is not blank string
-                if self.index(strings[string_id][active_edge]) != 0 or not active_node.is_root:
-                    child.suffix_id.append((string_id, start))
+                # Update child start to new value and set new child as parent of old child
+                nodes.start[child] = node_index
+                nodes.set_child(middle, child_string[node_index], child)
 
-                if active_node.is_root:
+                # Create new node
+                leaf = nodes.add(string_id=string_id, start=string_index, end=len(string) - 1, is_leaf=True)
+                nodes.set_child(middle, string[string_index], leaf)
+
+                # Store Suffix ID
+                nodes.add_suffix(leaf, string_id, start)
+
+                # Reset Child and Update Suffix Links
+                child = middle
+                if previous_node != NONE:
+                    nodes.suffix_link[previous_node] = child
+                nodes.suffix_link[child] = ROOT
+
+                if active_node == ROOT:
                     # Internal Node Created, AN/AE maintained, AL is i-j-1, Not Showstopper
                     return child, active_node, active_edge, end - start - 1, False
                 else:
-                    if active_node.suffix_link.is_root:
+                    if nodes.suffix_link[active_node] == ROOT:
                         # Internal Node Created, Traverse SL for AN, AE maintained, AL is i-j-1, Not Showstopper
-                        return child, active_node.suffix_link, active_edge, end - start - 1, False
+                        return child, nodes.suffix_link[active_node], active_edge, end - start - 1, False
                     else:
                         # Internal Node Created, Traverse SL for AN, AE/AL maintained, Not Showstopper
-                        return child, active_node.suffix_link, active_edge, active_length, False
+                        return child, nodes.suffix_link[active_node], active_edge, active_length, False
+
+            # String completely traversed not ending at leaf
+            else:
+                # Special Rule: String completely traversed, next node is leaf
+                if nodes.is_leaf[child] and active_length == node_length - 1:
+
+                    # Store Suffix ID only if leaf is not blank string
+                    if string[active_edge] != 0 or active_node != ROOT:
+                        nodes.add_suffix(child, string_id, start)
+
+                    if active_node == ROOT:
+                        # Internal Node Created, AN/AE maintained, AL is i-j-1, Not Showstopper
+                        return child, active_node, active_edge, end - start - 1, False
+                    else:
+                        if nodes.suffix_link[active_node] == ROOT:
+                            # Internal Node Created, Traverse SL for AN, AE maintained, AL is i-j-1, Not Showstopper
+                            return child, nodes.suffix_link[active_node], active_edge, end - start - 1, False
+                        else:
+                            # Internal Node Created, Traverse SL for AN, AE/AL maintained, Not Showstopper
+                            return child, nodes.suffix_link[active_node], active_edge, active_length, False
 
-            # Rule 3: String completely traversed not ending at leaf, next node is not leaf
-            # No Internal Node Created, AN/AE maintained, Increment AL, Is Showstopper
-            return None, active_node, active_edge, active_length + 1, True
+                # Rule 3: String completely traversed not ending at leaf, next node is not leaf
+                # No Internal Node Created, AN/AE maintained, Increment AL, Is Showstopper
+                return NONE, active_node, active_edge, active_length + 1, True
 
     def pattern_match(self, texts, patterns):
         """
         Case Insensitive Pattern matching algorithm
 
-        :param texts: List of strings in GST sorted in same order as insertion and terminated with $
+        :param texts: List of strings in GST sorted in same order as insertion and terminated with $ (not needed as the
+        GST keeps its own Char IDs of them, so may be None)
         :param patterns: List of patterns to check for matches
         :return: List of (j, i, k) tuples where j = Index of pattern in patterns, i = Index of text in texts, k = Index
         where patterns[j] occurs in texts[i]
         """
-        # Output
-        matches = []
+        return list(self.iter_matches(patterns))
 
+    def iter_matches(self, patterns):
+        """
+        Case Insensitive Pattern matching algorithm, giving matches one at a time as they are found so they do not all
+        need to be in memory at once. The GST is locked (it cannot be changed by other threads) until the generator is
+        exhausted or closed.
+
+        :param patterns: List of patterns to check for matches
+        :return: Generator of (j, i, k) tuples in the same order as pattern_match
+        """
         # Loop through patterns
-        for i in range(len(patterns)):
+        with self.lock:
+            for i in range(len(patterns)):
+
+                # If pattern is empty, no matches
+                if len(patterns[i]) > 0:
+
+                    # Traverse Pattern and give the Suffix IDs below the node it ends in
+                    node = self.traverse_pattern(patterns[i])
+                    if node != NONE:
+                        for text_id, index in self.suffix_ids(node):
+                            yield i, text_id, index
 
-            # If pattern is empty, no matches
-            if patterns[i] != "":
+    def traverse_pattern(self, pattern):
+        """
+        Traverse the case folded pattern and check if it exists in GST. As the GST is case folded too, there is only
+        one link to follow for every char.
+
+        :param pattern: A Pattern to check for matches
+        :return: Node the pattern ends in, NONE if pattern does not exist
+        :raises TypeError: If the pattern is not the same type as the texts
+        """
+        # Patterns with chars not in any text do not exist
+        self.check_type(pattern)
+        pattern = [self.alphabet.get(char, NONE) for char in fold(pattern)]
+        if NONE in pattern:
+            return NONE
+
+        # Important Variables
+        nodes = self.nodes
+        current = ROOT
+        pattern_index = 0
 
-                # Traverse Pattern
-                nodes = self.traverse_pattern(texts, patterns[i])
+        while pattern_index < len(pattern):
+            # No Link, pattern does not exist
+            child = nodes.child(current, pattern[pattern_index])
+            if child == NONE:
+                return NONE
 
-                # Inorder traverse from each node to get matches
-                for node in nodes:
-                    current_matches = self.suffix_array_aux(node, acc=[])
+            # Important Variables
+            text = self.codes[nodes.string_id[child]]
+            text_index = nodes.start[child]
+            text_end = nodes.end[child]
 
-                    # Suffix IDs are in separate container arrays. We need to extract them.
-                    for array in current_matches:
-                        for text_id, index in array:
-                            matches.append((i, text_id, index))
+            # Compare chars in text node and pattern
+            while pattern_index < len(pattern) and text_index <= text_end:
+
+                # Mismatched chars, no matches
+                if pattern[pattern_index] != text[text_index]:
+                    return NONE
+
+                # Increment Counters
+                pattern_index += 1
+                text_index += 1
+
+            # Pattern exists or node completely traversed, jump to next node
+            current = child
 
         # Done
-        return matches
+        return current
 
-    def traverse_pattern(self, texts, pattern):
+    def count(self, pattern):
         """
-        Traverse the pattern and check if it exists in GST.
+        Counts the occurrences of a pattern without listing them
 
-        :param texts: List of strings in GST sorted in same order as insertion and terminated with $
-        :param pattern: A Pattern to check for matches
-        :return: End node of pattern, None if pattern does not exist
+        :param pattern: A Pattern
+        :return: Number of occurrences of pattern in all texts
         """
-        # Go two ways
-        if pattern[0].isalpha():
-            acc = self.traverse_pattern_aux(self.root, texts, pattern, 0, True, [])
-            return self.traverse_pattern_aux(self.root, texts, pattern, 0, False, acc)
-
-        # Go one way
-        else:
-            return self.traverse_pattern_aux(self.root, texts, pattern, 0, True, [])
+        with self.lock:
+            if not self.annotated:
+                self.annotate()
+            node = self.traverse_pattern(pattern) if len(pattern) > 0 else NONE
+            return self.nodes.leaf_count[node] if node != NONE else 0
 
-    def traverse_pattern_aux(self, current, texts, pattern, start, upper, acc):
+    def documents(self, pattern, k=None):
         """
-        Auxiliary method for traverse_pattern
+        Gets the texts a pattern occurs most often in. Up to top_documents texts are kept at every node, so for k up to
+        that (or if the pattern is in no more texts than that) this takes O(m + k). For more, they are counted from
+        the Suffix IDs below the node, which takes O(occ) like pattern_match.
 
-        :param current: Current node
-        :param texts: List of strings in GST sorted in same order as insertion and terminated with $
-        :param pattern: A Pattern to check for matches
-        :param start: Starting index of pattern
-        :param upper: True - Traverse uppercase link, False - Traverse lowercase link
-        :param acc: Accumulator to store nodes
-        :return: End node of pattern, None if pattern does not exist
-        """
-        # Check if child exists
-        if pattern[start].isalpha():
-            # Set child to uppercase link or lowercase link
-            if upper:
-                child = current.link[self.index(pattern[start].upper())]
+        :param pattern: A Pattern
+        :param k: Number of texts (Default to top_documents)
+        :return: List of up to k (text_id, count) tuples, most occurrences first (then lowest text_id first)
+        """
+        with self.lock:
+            # Important Variables
+            if not self.annotated:
+                self.annotate()
+            nodes = self.nodes
+            node = self.traverse_pattern(pattern) if len(pattern) > 0 else NONE
+            if node == NONE:
+                return []
+
+            # Kept at node
+            k = self.top_documents if k is None else k
+            if k <= self.top_documents or nodes.doc_count[node] <= self.top_documents:
+                start = nodes.top_start[node]
+                return [(nodes.top_text[i], nodes.top_count[i])
+                        for i in range(start, start + min(k, nodes.doc_count[node], self.top_documents))]
+
+            # Count Suffix IDs
+            counts = Counter(text_id for text_id, _ in self.suffix_ids(node))
+            return heapq.nsmallest(k, counts.items(), key=lambda item: (-item[1], item[0]))
+
+    def annotate(self):
+        """
+        Annotates every node with the number of Suffix IDs below it, the number of texts they are in and the texts they
+        are most often in. Removed texts are left out.
+        """
+        # Important Variables
+        nodes = self.nodes
+        nodes.leaf_count = array("i", [0]) * len(nodes)
+        nodes.doc_count = array("i", [0]) * len(nodes)
+        nodes.top_start = array("i", [0]) * len(nodes)
+        nodes.top_text = array("i")
+        nodes.top_count = array("i")
+
+        # Children before parents
+        for current, _, _, occurrences, count in self.bottom_up():
+            nodes.leaf_count[current] = occurrences
+            nodes.doc_count[current] = len(count)
+            nodes.top_start[current] = len(nodes.top_text)
+            if len(count) > 1:
+                top = heapq.nsmallest(self.top_documents, count.items(), key=lambda item: (-item[1], item[0]))
             else:
-                child = current.link[self.index(pattern[start].lower())]
+                top = count.items()
+            for text_id, text_count in top:
+                nodes.top_text.append(text_id)
+                nodes.top_count.append(text_count)
 
-        # Set to default if does not exist or performing case sensitive comparison
-        else:
-            child = current.link[self.index(pattern[start])]
-
-        # No Link, go back up
-        if child is None:
-            return acc
+        # Done
+        self.annotated = True
 
+    def bottom_up(self, merged=None):
+        """
+        Visits the nodes in reverse preorder so children come before their parent. Every node is given with its string
+        depth (leaves not counting the terminal), its number of Suffix IDs and the count of each text among them, which
+        are merged into the parent once the node has been visited by adding the smaller dict into the larger. Removed
+        texts are left out.
+
+        :param merged: Function called with (node, text_id) when counts of a text from two children are merged into
+        node, i.e. where the text first has two Suffix IDs below a node that are not in the same child (None for none)
+        :return: Generator of (node, parent, length, occurrences, count) tuples where count is a dict of text_id ->
+        count (only valid until the next node is visited)
+        """
         # Important Variables
-        pattern_index = start
-        text_id = child.string_id
-        text_index = child.start
-
-        # Compare chars in text node and pattern
-        while pattern_index <= len(pattern) - 1 and text_index <= child.end:
-
-            # Mismatched chars, no matches
-            if pattern[pattern_index].upper() != texts[text_id][text_index].upper():
-                return acc
-
-            # Increment Counters
-            pattern_index += 1
-            text_index += 1
-
-        # Pattern exists, return root node for traversal
-        if pattern_index > len(pattern) - 1:
-            acc.append(child)
-            return acc
-
-        # Node completely traversed, pattern has not. Jump to next node.
-        elif text_index > child.end:
-            # Go two ways
-            if pattern[pattern_index].isalpha():
-                acc = self.traverse_pattern_aux(child, texts, pattern, pattern_index, upper, acc)
-                return self.traverse_pattern_aux(child, texts, pattern, pattern_index, not upper, acc)
-
-            # Go one way
+        nodes = self.nodes
+        length = array("i", [0]) * len(nodes)  # String depth of node
+        occurrences = array("i", [0]) * len(nodes)
+
+        # Preorder with parents (the last node seen at the level above) and string depths
+        order = array("i")
+        parent = array("i", [NONE]) * len(nodes)
+        path = []
+        for current, level in self.preorder(ROOT):
+            del path[level:]
+            if level > 0:
+                parent[current] = path[-1]
+                length[current] = length[parent[current]] + nodes.end[current] - nodes.start[current] + 1
+                if nodes.is_leaf[current]:
+                    length[current] -= 1    # Terminal
+            path.append(current)
+            order.append(current)
+
+        # Children before parents
+        counts = {}     # Node -> dict of text_id -> count merged from its children so far
+        for current in reversed(order):
+            # Counts of texts below node
+            if nodes.is_leaf[current]:
+                count = {}
+                for text_id, _ in nodes.suffix_ids(current):
+                    if text_id not in self.removed:
+                        count[text_id] = count.get(text_id, 0) + 1
+                        occurrences[current] += 1
             else:
-                return self.traverse_pattern_aux(child, texts, pattern, pattern_index, upper, acc)
+                count = counts.pop(current, {})
+            yield current, parent[current], length[current], occurrences[current], count
+
+            # Merge into parent
+            above = parent[current]
+            if current != ROOT and len(count) > 0:
+                occurrences[above] += occurrences[current]
+                into = counts.get(above)
+                if into is None:
+                    counts[above] = count
+                else:
+                    if len(into) < len(count):
+                        into, count = count, into
+                    for text_id, text_count in count.items():
+                        if merged is not None and text_id in into:
+                            merged(above, text_id)
+                        into[text_id] = into.get(text_id, 0) + text_count
+                    counts[above] = into
+
+    def analyse(self, k=None, min_length=None, repeated=False):
+        """
+        Finds the longest substring common to k texts, the maximal repeats and the longest repeated substring of every
+        text (whichever are asked for) in one bottom_up pass over the tree. Removed texts are left out.
+
+        A node is common to the texts in its count. A text repeats at the deepest node where it first has 2 Suffix IDs
+        (a leaf with two of them, or a node two of its children's counts are merged into). A node with at least 2
+        occurrences is a maximal repeat if the chars before and after its occurrences are DIVERSE (not all the same,
+        or one is at the start or end of a text).
+
+        :param k: Number of texts the common substring must be in (None to not find it)
+        :param min_length: Shortest maximal repeat to report (None to not find them)
+        :param repeated: Whether to find the longest repeated substring of every text
+        :return: (common, repeats, repeated) where common is the longest substring in at least k texts ("" if there is
+        none), repeats is a list of (substring, occurrences) tuples of maximal repeats (longest first) and repeated is
+        a list of the longest substring occurring at least twice in every text ("" if there is none), each None if it
+        was not asked for. Substrings are case folded.
+        """
+        with self.lock:
+            # Important Variables
+            nodes = self.nodes
+            codes = self.codes
+            length = array("i", [0]) * len(nodes)  # String depth of node (once visited)
+            left = array("i", [NONE]) * len(nodes)  # Char ID before every occurrence, DIVERSE or NONE if none
+            right = array("i", [NONE]) * len(nodes)     # Char ID after every occurrence, DIVERSE or NONE if none
+
+            # Best nodes found
+            common = ROOT
+            repeats = []
+            deepest = [ROOT] * len(codes)   # Node of longest repeated substring of every text
+            pending = {}    # Node -> texts whose counts from two children were merged into it
+
+            def merged(node, text_id):
+                """
+                Keeps a text that has 2 Suffix IDs below a node until the node is visited and its length is known
+
+                :param node: Node ID
+                :param text_id: Index of text
+                """
+                pending.setdefault(node, []).append(text_id)
+
+            # Children before parents
+            for current, above, depth, occurrences, count in self.bottom_up(merged if repeated else None):
+                length[current] = depth
+
+                # Texts with 2 Suffix IDs below node (deeper nodes have been visited)
+                if repeated:
+                    if nodes.is_leaf[current]:
+                        pending[current] = [text_id for text_id, text_count in count.items() if text_count >= 2]
+                    for text_id in pending.pop(current, []):
+                        if depth > length[deepest[text_id]]:
+                            deepest[text_id] = current
+
+                # Common to k texts (ties go to the first in preorder)
+                if k is not None and len(count) >= k and depth >= length[common]:
+                    common = current
+
+                # Maximal repeats
+                if min_length is not None:
+                    # Leaf: chars around its Suffix IDs
+                    if nodes.is_leaf[current]:
+                        for text_id, index in nodes.suffix_ids(current):
+                            if text_id not in self.removed:
+                                char = codes[text_id][index - 1] if index > 0 else DIVERSE
+                                left[current] = char if left[current] in (NONE, char) else DIVERSE
+                        right[current] = DIVERSE if occurrences > 0 else NONE   # Ends of texts
+
+                    # Maximal repeat (a leaf whose edge is only the terminal is the same string as its parent)
+                    terminal = nodes.is_leaf[current] and nodes.start[current] == nodes.end[current]
+                    if occurrences >= 2 and left[current] == right[current] == DIVERSE and depth >= min_length and \
+                            current != ROOT and not terminal:
+                        repeats.append((current, occurrences))
+
+                    # Chars around node are around its parent too, or the first char of the edge into node is after it
+                    if current != ROOT and occurrences > 0:
+                        left[above] = left[current] if left[above] in (NONE, left[current]) else DIVERSE
+                        char = nodes.char[current] if nodes.char[current] != 0 else DIVERSE
+                        right[above] = char if right[above] in (NONE, char) else DIVERSE
+
+            # Done
+            if k is not None:
+                common = self.substring(common, length[common])
+            if min_length is not None:
+                repeats.sort(key=lambda repeat: (-length[repeat[0]], repeat[0]))
+                repeats = [(self.substring(node, length[node]), occurrences) for node, occurrences in repeats]
+            if repeated:
+                deepest = [self.substring(node, length[node]) for node in deepest]
+            return common if k is not None else None, repeats if min_length is not None else None, \
+                deepest if repeated else None
+
+    def substring(self, node, length):
+        """
+        Gets the path label of a node, the chars on the path from the root to it. The edge into a node is in the text
+        of its string_id just after the rest of the path.
 
-    def suffix_array(self):
+        :param node: Node ID
+        :param length: String depth of node (not counting the terminal)
+        :return: Case folded substring
         """
-        Computes the suffix array of the strings stored in GST.
+        if length == 0:
+            return b"" if self.binary else ""
+        end = self.nodes.end[node] - self.nodes.is_leaf[node]
+        return self.decode(self.codes[self.nodes.string_id[node]][end - length + 1:end + 1])
 
-        :return: Suffix array of strings in form of (i, j) where i is string_id and j is suffix_id of strings[i]
+    def longest_common_substring(self, k=2):
         """
-        # Important Variables
-        suffix_array = []
-        arrays = self.suffix_array_aux(self.root, acc=[])
+        Finds the longest substring common to at least k texts
 
-        # Suffix IDs are in separate container arrays. We need to extract them.
-        for array in arrays:
-            for suffix_id in array:
-                suffix_array.append(suffix_id)
+        :param k: Number of texts
+        :return: Case folded substring ("" if there is none)
+        """
+        return self.analyse(k=k)[0]
 
-        # Done
-        return suffix_array
+    def maximal_repeats(self, min_length=1):
+        """
+        Finds the maximal repeats of the texts, the substrings occurring at least twice that cannot be extended to the
+        left or right without losing an occurrence
 
-    def suffix_array_aux(self, current, acc):
+        :param min_length: Shortest repeat to report
+        :return: List of (substring, occurrences) tuples, longest first
         """
-        Auxiliary method for suffix_array.
+        return self.analyse(min_length=min_length)[1]
 
-        :param current: Current Node
-        :param acc: Accumulator to store suffix ids
-        :return: Suffix array of strings
+    def longest_repeated_substrings(self):
         """
-        # Base Case: Append Suffix ID and return
-        if current.is_leaf:
-            acc.append(current.suffix_id)
-            return acc
+        Finds the longest substring occurring at least twice in every text
 
-        # Inductive Case: Traverse Links until Base Case reached
-        else:
-            for link in current.link:
-                if link is not None:
-                    acc = self.suffix_array_aux(link, acc)
-            return acc
+        :return: List of case folded substrings indexed by text ("" if a text has no repeat)
+        """
+        return self.analyse(repeated=True)[2]
 
-    def display(self, strings):
+    def preorder(self, node=ROOT):
         """
-        Display the Generalised Suffix Tree in console. For debugging purposes.
+        Visits the nodes below a node (and the node itself) in order, using a stack instead of recursion so trees of any
+        depth can be visited. The stack holds the next node to visit at every level.
 
-        :param strings: Strings stored in suffix tree
+        :param node: Node ID
+        :return: Generator of (node, level) tuples where level is the number of nodes above it (below the first node)
         """
-        self.display_aux(strings, self.root, level=0)
+        # Important Variables
+        nodes = self.nodes
+        stack = [(node, 0)]
+
+        while len(stack) > 0:
+            current, level = stack.pop()
 
-    def display_aux(self, strings, current, level):
+            # Siblings of the first node are not below it
+            if level > 0 and nodes.next_sibling[current] != NONE:
+                stack.append((nodes.next_sibling[current], level))
+
+            # Visit node then its children
+            yield current, level
+            if nodes.first_child[current] != NONE:
+                stack.append((nodes.first_child[current], level + 1))
+
+    def leaves(self, node=ROOT):
         """
-        Auxiliary method for display.
+        Visits the leaves below a node in order
 
-        :param strings: Strings stored in generalised suffix tree
-        :param current: Current Node
-        :param level: Depth of Node (i.e. height from root)
+        :param node: Node ID
+        :return: Generator of Node IDs of leaves
         """
-        # Base Case: Leaf reached, print out Suffix ID
-        if current.is_leaf:
-            # Indent based on level
-            for _ in range(level):
-                print(">", end="")
+        for current, _ in self.preorder(node):
+            if self.nodes.is_leaf[current]:
+                yield current
 
-            # Print Node details
-            print("\'" + strings[current.string_id][current.start:current.end+1] + "\':" + "[" +
-                  str(current.string_id) + "," + str(current.start) + "," + str(current.end) + "] (" +
-                  str(current.suffix_id) + ")")
+    def suffix_ids(self, node=ROOT):
+        """
+        Gets the Suffix IDs of the leaves below a node in order, leaving out removed texts
 
-        # Inductive Case: do not print out Suffix ID
-        else:
+        :param node: Node ID
+        :return: Generator of (i, j) tuples where i is string_id and j is suffix_id of strings[i]
+        """
+        for leaf in self.leaves(node):
+            for text_id, index in self.nodes.suffix_ids(leaf):
+                if text_id not in self.removed:
+                    yield text_id, index
+
+    def suffix_array(self):
+        """
+        Computes the suffix array of the strings stored in GST.
+
+        :return: Suffix array of strings in form of (i, j) where i is string_id and j is suffix_id of strings[i]
+        """
+        with self.lock:
+            return list(self.suffix_ids(ROOT))
+
+    def display(self, strings):
+        """
+        Display the Generalised Suffix Tree in console. For debugging purposes.
+
+        :param strings: Strings stored in suffix tree
+        """
+        for current, level in self.preorder(ROOT):
             # Print Root
-            if current == self.root:
+            if current == ROOT:
                 print("[ROOT]")
 
-            # Loop through links
-            for i in range(len(current.link)):
+            # Leaf: print out Suffix ID
+            elif self.nodes.is_leaf[current]:
+                print(">" * level + self.label(strings, current) + " (" + str(self.nodes.suffix_ids(current)) + ")")
 
-                # Print if Node exists
-                if current.link[i] is not None:
+            # Internal Node: print out Suffix Link instead
+            elif self.nodes.suffix_link[current] != ROOT:
+                print(">" * level + self.label(strings, current) + " ----> " +
+                      self.label(strings, self.nodes.suffix_link[current]))
+            else:
+                print(">" * level + self.label(strings, current) + " ----> [ROOT]")
 
-                    # All information is in child node
-                    child = current.link[i]
+    def label(self, strings, node):
+        """
+        Gets the edge label of a node and its compressed representation for display purposes
 
-                    # Print if not leaf (leaf is for base case)
-                    if not child.is_leaf:
+        :param strings: Strings stored in suffix tree
+        :param node: Node ID
+        :return: Label as 'chars':[string_id,start,end]
+        """
+        string_id, start, end = self.nodes.string_id[node], self.nodes.start[node], self.nodes.end[node]
+        return "\'" + strings[string_id][start:end+1] + "\':[" + ",".join([str(string_id), str(start), str(end)]) + "]"
 
-                        # Indent based on level
-                        for _ in range(level + 1):
-                            print(">", end="")
 
-                        # Print Node details
-                        if child.suffix_link != self.root:
-                            print("\'" + strings[child.string_id][child.start:child.end+1] + "\':[" +
-                                  str(child.string_id) + "," + str(child.start) + "," + str(child.end) + "] ----> " +
-                                  strings[child.string_id][child.suffix_link.start:child.suffix_link.end+1] +
-                                  ":[" + str(child.suffix_link.string_id) + "," + str(child.suffix_link.start) + "," +
-                                  str(child.suffix_link.end) + "]")
-                        else:
-                            print("\'" + strings[child.string_id][child.start:child.end+1] + "\':[" +
-                                  str(child.string_id) + "," + str(child.start) + "," + str(child.end) +
-                                  "] ----> [ROOT]")
+ENGINES = {"gst": GeneralisedSuffixTree, "sa": GeneralisedSuffixArray}
+
 
-                    # Traverse the Tree
-                    self.display_aux(strings, child, level + 1)
+def terminate(text):
+    """
+    Adds the terminal $ to the end of a text
+
+    :param text: String or bytes
+    :return: Text terminated with $
+    """
+    return text + ("$" if isinstance(text, str) else b"$")
 
 
-def read_input(filename):
+def read_input(filename, binary=False):
     """
     Function to read input and return its contents in the appropriate format
 
     :param filename: Name of file
+    :param binary: Whether to read the txt/pat files as bytes instead of text
     :return: Appropriate input for computation
     """
     # Important Variables
@@ -476,7 +1078,7 @@ def read_input(filename):
 
         # This is a file name
         else:
-            str_file = open(row[1], "r")
+            str_file = open(row[1], "rb" if binary else "r")
             string = str_file.read()
             str_file.close()
             strings.append(string)
@@ -496,49 +1098,139 @@ def read_input(filename):
 
 def write_output(filename, matches):
     """
-    Writes output to appropriately named output file
+    Writes output to appropriately named output file. Matches are written as they come in batches of OUTPUT_BATCH
+    lines through a buffer of OUTPUT_BUFFER bytes, so a generator of any number of matches is written in constant
+    memory. The first match is flushed straight away so results show up in the file without waiting for the rest.
 
     :param filename: Name of output file
-    :param matches: Result of computation
+    :param matches: Result of computation (list or generator of (j, i, k) tuples)
     """
     # Open Output
-    output_file = open(filename, "w")
-
-    # Write if matches present
-    if len(matches) > 0:
-        output_file.write(" ".join([str(matches[0][0] + 1), str(matches[0][1] + 1), str(matches[0][2] + 1)]))
-        for i in range(1, len(matches)):
-            output_file.write("\n")
-            output_file.write(" ".join([str(matches[i][0] + 1), str(matches[i][1] + 1), str(matches[i][2] + 1)]))
+    output_file = open(filename, "w", buffering=OUTPUT_BUFFER)
+    matches = iter(matches)
+
+    # Write first match without a newline before it
+    first = next(matches, None)
+    if first is not None:
+        output_file.write(" ".join([str(first[0] + 1), str(first[1] + 1), str(first[2] + 1)]))
+        output_file.flush()
+
+        # Write the rest a batch at a time
+        batch = []
+        for j, i, k in matches:
+            batch.append("".join(["\n", " ".join([str(j + 1), str(i + 1), str(k + 1)])]))
+            if len(batch) == OUTPUT_BATCH:
+                output_file.writelines(batch)
+                batch = []
+        output_file.writelines(batch)
 
     # Done
     output_file.close()
 
 
-def main(texts, patterns):
+def main(texts, patterns, engine="gst"):
     """
-    Main Method. Uses a GST to perform multiple text/pattern pattern matching.
+    Main Method. Uses a GST (or a Generalised Suffix Array) to perform multiple text/pattern pattern matching.
 
     :param texts: List of texts
     :param patterns: List of patterns
-    :return: List of (j, i, k) tuples where j = Index of pattern in patterns, i = Index of text in texts, k = Index
-    where patterns[j] occurs in texts[i]
+    :param engine: gst for a Generalised Suffix Tree, sa for a Generalised Suffix Array (less memory, slower queries)
+    :return: Generator of (j, i, k) tuples where j = Index of pattern in patterns, i = Index of text in texts, k =
+    Index where patterns[j] occurs in texts[i]
     """
     # Add terminal $ to end of all texts
     for i in range(len(texts)):
-        texts[i] = "".join([texts[i], "$"])
+        texts[i] = terminate(texts[i])
 
     # Perform Pattern Matching and return
-    return GeneralisedSuffixTree(texts).pattern_match(texts, patterns)
+    return ENGINES[engine](texts).iter_matches(patterns)
+
+
+def read_files(filenames, binary=False):
+    """
+    Reads the contents of a list of files
+
+    :param filenames: Names of files
+    :param binary: Whether to read the files as bytes instead of text
+    :return: List of contents of files
+    """
+    strings = []
+    for filename in filenames:
+        file = open(filename, "rb" if binary else "r")
+        strings.append(file.read())
+        file.close()
+    return strings
+
+
+def build_index(index_file, texts):
+    """
+    Builds the GST of a list of texts and saves it to an index file
+
+    :param index_file: Name of index file
+    :param texts: List of texts
+    """
+    # Add terminal $ to end of all texts
+    texts = [terminate(text) for text in texts]
+
+    # Build and Save
+    GeneralisedSuffixTree(texts).save(index_file)
+
+
+def query(index_file, patterns):
+    """
+    Performs multiple text/pattern pattern matching with the GST saved in an index file
+
+    :param index_file: Name of index file
+    :param patterns: List of patterns
+    :return: Generator of (j, i, k) tuples where j = Index of pattern in patterns, i = Index of text in texts, k =
+    Index where patterns[j] occurs in texts[i]
+    :raises TypeError: If the patterns are not the same type as the texts in the index file (str or bytes)
+    """
+    tree = GeneralisedSuffixTree.load(index_file)
+    for pattern in patterns:
+        tree.check_type(pattern)
+    return tree.iter_matches(patterns)
 
 
 if __name__ == "__main__":
+    # Parse Arguments
+    parser = argparse.ArgumentParser(description="Case insensitive pattern matching with a Generalised Suffix Tree")
+    parser.add_argument("command", help="Query file of texts and patterns, or build-index or query")
+    parser.add_argument("files", nargs="*", help="build-index: index file then text files, "
+                                                 "query: index file then pattern files")
+    parser.add_argument("--engine", choices=sorted(ENGINES),
+                        help="Index to match patterns with in query file mode (Default to gst, index files are GSTs)")
+    parser.add_argument("--bytes", action="store_true", help="Read texts and patterns as bytes (for binary data)")
+    args = parser.parse_args()
+    if args.command in ("build-index", "query") and args.engine is not None:
+        parser.error("--engine cannot be used with " + args.command + " as index files always hold a GST")
+    if args.command not in ("build-index", "query") and len(args.files) > 0:
+        parser.error("a query file names its own text and pattern files, so no other files can be given")
+
+    # Build Index File from Texts
+    if args.command == "build-index":
+        if len(args.files) < 1:
+            parser.error("build-index needs an index file")
+        build_index(args.files[0], read_files(args.files[1:], args.bytes))
+
+    # Answer Patterns from Index File
+    elif args.command == "query":
+        if len(args.files) < 1:
+            parser.error("query needs an index file")
+        try:
+            matches = query(args.files[0], read_files(args.files[1:], args.bytes))
+        except TypeError as error:
+            parser.error(str(error) + " (the index file was built " + ("without" if args.bytes else "with") +
+                         " --bytes)")
+        write_output("output_gst.txt", matches)
+
     # Read Input File
-    query_file = sys.argv[1]
-    text_inputs, pattern_inputs = read_input(query_file)
+    else:
+        query_file = args.command
+        text_inputs, pattern_inputs = read_input(query_file, args.bytes)
 
-    # Actual Computation
-    result = main(text_inputs, pattern_inputs)
+        # Actual Computation
+        result = main(text_inputs, pattern_inputs, args.engine or "gst")
 
-    # Write Output File
-    write_output("output_gst.txt", result)
+        # Write Output File
+        write_output("output_gst.txt", result)
@@ -0,0 +1,306 @@
+"""
+Generalised Suffix Array of multiple strings, built directly with the SA-IS algorithm in linear time along with its
+LCP array (Kasai's algorithm), as a low memory alternative to the Generalised Suffix Tree in gst.py. Performs the same
+case insensitive pattern matching by binary search.
+
+The strings are joined into one array of char codes with a unique separator after each of them, the separator of
+string i being code i (smaller than every char), so no suffix can match past the end of its string and identical
+suffixes of different strings are sorted by string index. The separator takes the place of the terminal $ (which no
+char in a pattern can match, as in the GST), so strings may contain any char, or be bytes.
+"""
+
+__author__ = "Arthur Lee"
+
+from array import array
+from bisect import bisect_right
+
+
+def fold(string):
+    """
+    Folds the case of a string one char at a time so every index in the folded string is the same char in the string
+
+    :param string: String
+    :return: Uppercase string (chars whose uppercase is more than one char are unchanged)
+    """
+    folded = string.upper()
+    if len(folded) == len(string):
+        return folded
+    return "".join(char.upper() if len(char.upper()) == 1 else char for char in string)
+
+
+def typecode(upper):
+    """
+    Gets the smallest array typecode that can store codes up to upper
+
+    :param upper: Largest code
+    :return: Typecode
+    """
+    if upper < 1 << 8:
+        return "B"
+    elif upper < 1 << 16:
+        return "H"
+    return "i"
+
+
+def sa_is(s, upper):
+    """
+    Computes the suffix array of a list of codes with the SA-IS algorithm. Suffixes are classified as S (smaller than
+    the next suffix) or L (larger), the leftmost S suffixes (LMS) are sorted by inducing the order of the others from
+    them, and if two LMS substrings are equal the LMS suffixes are sorted by recursing on the string of their ranks.
+
+    :param s: Array of codes from 0 to upper
+    :param upper: Largest code
+    :return: Suffix array as array of ints
+    """
+    # Base Cases
+    n = len(s)
+    if n == 0:
+        return array("i")
+    if n == 1:
+        return array("i", [0])
+    if n == 2:
+        return array("i", [0, 1] if s[0] < s[1] else [1, 0])
+
+    # Classify Suffixes (the last suffix is L)
+    sa = array("i", [-1]) * n
+    is_s = bytearray(n)
+    for i in range(n - 2, -1, -1):
+        is_s[i] = is_s[i + 1] if s[i] == s[i + 1] else s[i] < s[i + 1]
+
+    # Start of the L suffixes (sum_l) and S suffixes (sum_s) of every code in the suffix array
+    sum_l = [0] * (upper + 1)
+    sum_s = [0] * (upper + 1)
+    for i in range(n):
+        if not is_s[i]:
+            sum_s[s[i]] += 1
+        else:
+            sum_l[s[i] + 1] += 1
+    for i in range(upper + 1):
+        sum_s[i] += sum_l[i]
+        if i < upper:
+            sum_l[i + 1] += sum_s[i]
+
+    def induce(lms):
+        """
+        Induces the order of every suffix from the order of the LMS suffixes
+
+        :param lms: LMS suffixes in order
+        """
+        for i in range(n):
+            sa[i] = -1
+
+        # Place LMS suffixes at the start of the S suffixes of their code
+        buckets = sum_s[:]
+        for i in lms:
+            if i != n:
+                sa[buckets[s[i]]] = i
+                buckets[s[i]] += 1
+
+        # Place L suffixes from left to right (the last suffix comes before everything else with its code)
+        buckets = sum_l[:]
+        sa[buckets[s[n - 1]]] = n - 1
+        buckets[s[n - 1]] += 1
+        for i in range(n):
+            j = sa[i] - 1
+            if j >= 0 and not is_s[j]:
+                sa[buckets[s[j]]] = j
+                buckets[s[j]] += 1
+
+        # Place S suffixes from right to left
+        buckets = sum_l[:]
+        for i in range(n - 1, -1, -1):
+            j = sa[i] - 1
+            if j >= 0 and is_s[j]:
+                buckets[s[j] + 1] -= 1
+                sa[buckets[s[j] + 1]] = j
+
+    # Find LMS suffixes and sort them by their LMS substrings
+    lms_map = array("i", [-1]) * (n + 1)
+    lms = array("i")
+    for i in range(1, n):
+        if not is_s[i - 1] and is_s[i]:
+            lms_map[i] = len(lms)
+            lms.append(i)
+    m = len(lms)
+    induce(lms)
+
+    # Sort LMS suffixes by recursing on the ranks of their LMS substrings
+    if m > 0:
+        sorted_lms = array("i", [i for i in sa if lms_map[i] != -1])
+        ranks = array("i", [0]) * m
+        rank = 0
+        for k in range(1, m):
+            left, right = sorted_lms[k - 1], sorted_lms[k]
+            end_left = lms[lms_map[left] + 1] if lms_map[left] + 1 < m else n
+            end_right = lms[lms_map[right] + 1] if lms_map[right] + 1 < m else n
+
+            # Compare LMS substrings
+            same = end_left - left == end_right - right
+            if same:
+                while left < end_left and s[left] == s[right]:
+                    left += 1
+                    right += 1
+                if left == n or s[left] != s[right]:
+                    same = False
+            if not same:
+                rank += 1
+            ranks[lms_map[sorted_lms[k]]] = rank
+
+        # Induce again from the LMS suffixes in their final order
+        lms_sa = sa_is(ranks, rank)
+        for k in range(m):
+            sorted_lms[k] = lms[lms_sa[k]]
+        induce(sorted_lms)
+
+    # Done
+    return sa
+
+
+def lcp_array(s, sa):
+    """
+    Computes the LCP array with Kasai's algorithm: the suffix after i in text order shares at least one char less with
+    its predecessor in the suffix array than suffix i does.
+
+    :param s: Array of codes
+    :param sa: Suffix array of s
+    :return: Array of ints where lcp[i] is the length of the longest common prefix of suffixes sa[i - 1] and sa[i]
+    """
+    # Important Variables
+    n = len(s)
+    lcp = array("i", [0]) * n
+    rank = array("i", [0]) * n
+    for i in range(n):
+        rank[sa[i]] = i
+
+    # Compare every suffix with its predecessor, keeping what was matched
+    length = 0
+    for i in range(n):
+        if rank[i] == 0:
+            length = 0
+            continue
+        j = sa[rank[i] - 1]
+        while i + length < n and j + length < n and s[i + length] == s[j + length]:
+            length += 1
+        lcp[rank[i]] = length
+        if length > 0:
+            length -= 1
+
+    # Done
+    return lcp
+
+
+class GeneralisedSuffixArray:
+    """
+    Generalised Suffix Array with LCP array. Takes about 9 bytes per char (codes, suffix array and LCP array) where the
+    GST takes about 57, at the cost of a binary search per pattern.
+    """
+    def __init__(self, strings):
+        """
+        Constructor. Builds the suffix array and LCP array of the case folded strings.
+
+        :param strings: List of strings (or bytes) terminated with $
+        """
+        # Rank chars, separators come before every char
+        strings = [fold(string)[:-1] for string in strings]
+        self.binary = len(strings) > 0 and not isinstance(strings[0], str)
+        chars = sorted(set().union(*(set(string) for string in strings)))
+        self.ranks = {char: len(strings) + rank for rank, char in enumerate(chars)}
+        upper = len(strings) + len(chars) - 1
+
+        # Join strings into one array of codes, the separator replacing the terminal $
+        self.starts = []
+        self.codes = array(typecode(upper))
+        for i in range(len(strings)):
+            self.starts.append(len(self.codes))
+            self.codes.extend(map(self.ranks.__getitem__, strings[i]))
+            self.codes.append(i)
+
+        # Build Arrays
+        self.sa = sa_is(self.codes, upper)
+        self.lcp = lcp_array(self.codes, self.sa)
+
+    def check_type(self, text):
+        """
+        Checks a pattern is the same type as the strings in the suffix array, as chars of strings never match bytes
+
+        :param text: Pattern
+        :raises TypeError: If it is bytes in a suffix array of strings or a string in a suffix array of bytes
+        """
+        if isinstance(text, str) == self.binary:
+            raise TypeError("".join(["Suffix array holds ", "bytes" if self.binary else "strings", ", not ",
+                                     type(text).__name__]))
+
+    def find(self, pattern):
+        """
+        Finds the range of the suffix array of suffixes starting with the case folded pattern. Binary search keeps the
+        number of chars matched at both ends of the range and starts comparing after the smaller, and the end of the
+        range is where the LCP array drops below the length of the pattern.
+
+        :param pattern: A Pattern to check for matches
+        :return: (first, last) where sa[first:last] are the suffixes starting with pattern (first == last if none)
+        :raises TypeError: If the pattern is not the same type as the strings
+        """
+        # Patterns with chars not in any string do not occur
+        self.check_type(pattern)
+        codes = []
+        for char in fold(pattern):
+            if char not in self.ranks:
+                return 0, 0
+            codes.append(self.ranks[char])
+
+        # Important Variables (separators end every string, so comparisons never run off the end)
+        m = len(codes)
+        left, right = -1, len(self.sa)
+        left_matched = right_matched = 0
+
+        # Binary Search: suffix at left < pattern <= suffix at right
+        while right - left > 1:
+            middle = (left + right) // 2
+            position = self.sa[middle]
+            k = min(left_matched, right_matched)
+            while k < m and self.codes[position + k] == codes[k]:
+                k += 1
+            if k == m or self.codes[position + k] > codes[k]:
+                right, right_matched = middle, k
+            else:
+                left, left_matched = middle, k
+
+        # No suffix starts with pattern
+        if right == len(self.sa) or right_matched < m:
+            return right, right
+
+        # Extend range while suffixes share the pattern with the previous one
+        last = right + 1
+        while last < len(self.sa) and self.lcp[last] >= m:
+            last += 1
+        return right, last
+
+    def pattern_match(self, texts, patterns):
+        """
+        Case Insensitive Pattern matching algorithm
+
+        :param texts: List of strings in suffix array sorted in same order as insertion and terminated with $
+        :param patterns: List of patterns to check for matches
+        :return: List of (j, i, k) tuples where j = Index of pattern in patterns, i = Index of text in texts, k = Index
+        where patterns[j] occurs in texts[i]
+        """
+        return list(self.iter_matches(patterns))
+
+    def iter_matches(self, patterns):
+        """
+        Case Insensitive Pattern matching algorithm, giving matches one at a time as they are found so they do not all
+        need to be in memory at once
+
+        :param patterns: List of patterns to check for matches
+        :return: Generator of (j, i, k) tuples in the same order as pattern_match
+        """
+        # Loop through patterns
+        for i in range(len(patterns)):
+
+            # If pattern is empty, no matches
+            if len(patterns[i]) > 0:
+                first, last = self.find(patterns[i])
+                for rank in range(first, last):
+                    position = self.sa[rank]
+                    text_id = bisect_right(self.starts, position) - 1
+                    yield i, text_id, position - self.starts[text_id]
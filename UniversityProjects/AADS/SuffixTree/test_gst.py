@@ -0,0 +1,92 @@
+"""
+Tests for gst.py. Run with: python -m unittest test_gst
+"""
+
+__author__ = "Arthur Lee"
+
+import os
+import random
+import tempfile
+import unittest
+from collections import Counter
+
+import gst
+
+
+class SaveAfterChangesTest(unittest.TestCase):
+    """
+    Index files saved after texts are added or removed must give the same counts as the tree they were saved from
+    """
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "texts.idx")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def reload(self, tree):
+        tree.save(self.filename)
+        return gst.GeneralisedSuffixTree.load(self.filename)
+
+    def test_save_after_remove(self):
+        tree = gst.GeneralisedSuffixTree(["abc$", "xbc$"])
+        tree.remove_document(1)
+        loaded = self.reload(tree)
+        self.assertEqual(loaded.count("bc"), 1)
+        self.assertEqual(loaded.documents("bc"), [(0, 1)])
+
+    def test_save_after_add(self):
+        tree = gst.GeneralisedSuffixTree(["abc$"])
+        tree.add_document("zzz")
+        loaded = self.reload(tree)
+        self.assertEqual(loaded.count("zz"), 2)
+        self.assertEqual(loaded.documents("zz"), [(1, 2)])
+
+    def test_random_changes(self):
+        rng = random.Random(0)
+        for _ in range(50):
+            texts = ["".join(rng.choice("abc") for _ in range(rng.randint(0, 12))) for _ in range(rng.randint(1, 4))]
+            tree = gst.GeneralisedSuffixTree([text + "$" for text in texts])
+            for _ in range(rng.randint(1, 4)):
+                if rng.random() < 0.5:
+                    texts.append("".join(rng.choice("abc") for _ in range(rng.randint(0, 12))))
+                    tree.add_document(texts[-1])
+                else:
+                    tree.remove_document(rng.randrange(len(texts)))
+            compaction = tree.compaction
+            if compaction is not None:
+                compaction.join()
+            loaded = self.reload(tree)
+            for pattern in ["a", "b", "ab", "ca", "abc"]:
+                counts = Counter({i: sum(text.startswith(pattern, k) for k in range(len(text)))
+                                  for i, text in enumerate(texts) if i not in tree.removed})
+                self.assertEqual(loaded.count(pattern), sum(counts.values()))
+                self.assertEqual(tree.count(pattern), sum(counts.values()))
+
+
+class TextTypeTest(unittest.TestCase):
+    """
+    Patterns of the wrong type (str or bytes) for the texts must raise instead of matching nothing
+    """
+    def test_bytes_pattern_in_strings(self):
+        tree = gst.GeneralisedSuffixTree(["abc$"])
+        self.assertRaises(TypeError, tree.count, b"b")
+        self.assertRaises(TypeError, tree.pattern_match, None, [b"b"])
+
+    def test_string_pattern_in_bytes_index(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "texts.idx")
+            gst.build_index(filename, [b"ab\xff"])
+            self.assertRaises(TypeError, gst.query, filename, ["b"])
+            self.assertEqual(list(gst.query(filename, [b"\xff"])), [(0, 0, 2)])
+
+    def test_both_engines(self):
+        for engine in sorted(gst.ENGINES):
+            self.assertRaises(TypeError, list, gst.main(["abc"], [b"b"], engine))
+            self.assertRaises(TypeError, list, gst.main([b"abc"], ["b"], engine))
+            self.assertEqual(list(gst.main([b"abc"], [b"B"], engine)), [(0, 0, 1)])
+            self.assertEqual(list(gst.main(["abc"], ["B"], engine)), [(0, 0, 1)])
+
+
+if __name__ == "__main__":
+    unittest.main()